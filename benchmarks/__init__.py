@@ -0,0 +1,3 @@
+"""
+Benchmarks for the register decoder. Run with ``python -m benchmarks``\\ .
+"""
@@ -0,0 +1,68 @@
+"""
+Runs the benchmarks, or compares a run against a baseline.
+
+    python -m benchmarks run --output baseline.json
+    python -m benchmarks run --output current.json --compare baseline.json
+    python -m benchmarks compare baseline.json current.json
+
+Comparing exits with status 1 if any benchmark regressed.
+"""
+
+import argparse
+import json
+import sys
+
+from .suite import SIZES, OPERATIONS, benchmarks, run_benchmarks, compare_reports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--output", help="write the results to this JSON file")
+    run.add_argument("--compare", metavar="BASELINE", help="compare the results against this JSON file")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="the register counts to benchmark")
+    run.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    run.add_argument("--operations", type=int, default=OPERATIONS, help="operations per benchmark")
+    run.add_argument("--repeats", type=int, default=5, help="the number of times to time each benchmark")
+    run.add_argument("--threshold", type=float, default=0.1, help="the slowdown counted as a regression")
+
+    compare = commands.add_parser("compare", help="compare two sets of results")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1, help="the slowdown counted as a regression")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        suite = (benchmark for benchmark in benchmarks(args.sizes, args.operations) if args.filter in benchmark.name)
+        report = run_benchmarks(
+            suite, args.repeats, lambda name, seconds: print(f"{name:<45} {seconds * 1e9:12.1f} ns/op", flush=True)
+        )
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.compare is None:
+            return 0
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            report = json.load(f)
+
+    comparisons = compare_reports(baseline, report, args.threshold)
+    for comparison in comparisons:
+        flag = "REGRESSED" if comparison.regressed else ""
+        print(
+            f"{comparison.name:<45} {comparison.baseline * 1e9:12.1f} -> {comparison.current * 1e9:12.1f} ns/op "
+            f"{comparison.ratio:6.2f}x {flag}"
+        )
+    regressions = sum(comparison.regressed for comparison in comparisons)
+    print(f"{regressions} of {len(comparisons)} benchmarks regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Generators for register maps and transactions to benchmark with.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Tuple
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder
+from saleae.register_decoder.register_map import RegisterMapMeta
+
+
+def generate_registers(register_count: int, *, sparse: bool = False, seed: int = 0) -> List[Register]:
+    """
+    Generates a layout of registers one to four addresses wide, alternating between raw and integer registers.
+
+    :param sparse: Whether to leave large gaps between registers, so that they're spread over many pages, rather than
+        packing them together.
+    """
+
+    rng = random.Random(seed)
+    registers = []
+    address = 0
+    for i in range(register_count):
+        if sparse:
+            address += rng.choice((0, 1, 300, 5000))
+        address_width = rng.randint(1, 4)
+        if i % 2:
+            registers.append(
+                Register(
+                    address, address_width=address_width, value_type=int, byte_order=ByteOrder.LITTLE, signed=False
+                )
+            )
+        else:
+            registers.append(Register(address, address_width=address_width))
+        address += address_width
+    return registers
+
+
+def build_register_map(registers: List[Register], address_byte_width: int = 1) -> RegisterMapMeta:
+    """
+    Creates a register map class from generated registers.
+    """
+
+    members = {f"reg_{i}": register for i, register in enumerate(registers)}
+    members["address_byte_width"] = address_byte_width
+    return RegisterMapMeta("BenchmarkRegMap", (RegisterMap,), members)
+
+
+def register_schema(registers: List[Register], address_byte_width: int = 1) -> Dict[str, Any]:
+    """
+    Describes generated registers as a schema for :py:func:`~saleae.register_decoder.register_map_from_schema`\\ ,
+    naming them as :py:func:`build_register_map` does.
+    """
+
+    schema_registers = []
+    for i, register in enumerate(registers):
+        schema_register = {"name": f"reg_{i}", "address": register.address, "address_width": register.address_width}
+        if register.value_type is int:
+            schema_register.update(value_type="int", byte_order=register._byte_order.value, signed=register._signed)
+        schema_registers.append(schema_register)
+    return {"name": "BenchmarkRegMap", "address_byte_width": address_byte_width, "registers": schema_registers}
+
+
+def generate_transactions(
+    register_map: RegisterMapMeta, transaction_count: int, *, seed: int = 0
+) -> List[Tuple[int, bytes]]:
+    """
+    Generates transactions which each write one or two whole registers, as a driver would.
+    """
+
+    rng = random.Random(seed)
+    registers = list(register_map)
+    address_byte_width = register_map.address_byte_width
+    transactions = []
+    for _ in range(transaction_count):
+        index = rng.randrange(len(registers))
+        register = registers[index]
+        end = register.address + register.address_width
+        if index + 1 < len(registers) and rng.random() < 0.25:
+            # Burst into the next register when it directly follows
+            following = registers[index + 1]
+            if following.address == end:
+                end += following.address_width
+        transactions.append((register.address, rng.randbytes((end - register.address) * address_byte_width)))
+    return transactions
@@ -0,0 +1,189 @@
+"""
+The benchmarks, and running and comparing them.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Any
+
+from saleae.register_decoder import load_json
+
+from .maps import generate_registers, build_register_map, generate_transactions, register_schema
+
+SIZES = (10, 100, 1000, 10_000, 50_000)
+ADDRESS_BYTE_WIDTHS = (1, 2, 4)
+# The number of operations timed by each benchmark, apart from class construction
+OPERATIONS = 10_000
+
+
+class Benchmark(NamedTuple):
+    """
+    :ivar name: Identifies the benchmark across runs, as ``operation/layout/address width/register count``\\ .
+    :ivar operations: The number of operations each call of ``run`` performs.
+    :ivar run: Performs the operations being timed.
+    """
+
+    name: str
+    operations: int
+    run: Callable[[], Any]
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+    ratio: float
+    regressed: bool
+
+
+def benchmarks(sizes: Sequence[int] = SIZES, operations: int = OPERATIONS) -> Iterator[Benchmark]:
+    """
+    Generates every benchmark: each operation over each register count, dense and sparse layouts, cycling through the
+    address widths so that every width is covered without multiplying the number of benchmarks.
+    """
+
+    configurations = [(size, sparse) for size in sizes for sparse in (False, True)]
+    for i, (size, sparse) in enumerate(configurations):
+        address_byte_width = ADDRESS_BYTE_WIDTHS[i % len(ADDRESS_BYTE_WIDTHS)]
+        registers = generate_registers(size, sparse=sparse, seed=i)
+        register_map = build_register_map(registers, address_byte_width)
+        suffix = f"{'sparse' if sparse else 'dense'}/w{address_byte_width}/n{size}"
+
+        yield Benchmark(
+            f"build/{suffix}",
+            1,
+            lambda registers=registers, address_byte_width=address_byte_width: build_register_map(
+                registers, address_byte_width
+            ),
+        )
+
+        # Loading from a schema file, both parsing it and hitting the compiled cache. The directory lives as long as the
+        # benchmarks using it.
+        directory = tempfile.TemporaryDirectory()
+        schema_path = os.path.join(directory.name, "schema.json")
+        with open(schema_path, "w") as file:
+            json.dump(register_schema(registers, address_byte_width), file)
+        cache_dir = os.path.join(directory.name, "cache")
+        load_json(schema_path, cache_dir=cache_dir)
+
+        def load(schema_path=schema_path, directory=directory):
+            load_json(schema_path)
+
+        def load_cached(schema_path=schema_path, cache_dir=cache_dir, directory=directory):
+            load_json(schema_path, cache_dir=cache_dir)
+
+        yield Benchmark(f"load_json/{suffix}", 1, load)
+        yield Benchmark(f"load_json_cached/{suffix}", 1, load_cached)
+
+        transactions = generate_transactions(register_map, operations, seed=i)
+
+        def observe(register_map=register_map, transactions=transactions):
+            reg_map = register_map()
+            observe = reg_map.observe
+            for address, data in transactions:
+                observe(address, data)
+
+        def observe_many(register_map=register_map, transactions=transactions):
+            register_map().observe_many(transactions)
+
+        # The same transactions already flattened, as a capture decoder would produce them, which leaves only the cost
+        # of applying the batch
+        addresses = [address for address, _ in transactions]
+        buffer = b"".join(data for _, data in transactions)
+        offsets = list(itertools.accumulate((len(data) for _, data in transactions), initial=0))
+
+        def observe_many_flat(register_map=register_map, addresses=addresses, buffer=buffer, offsets=offsets):
+            register_map().observe_many(addresses, buffer, offsets)
+
+        def observe_many_per_transaction(register_map=register_map, transactions=transactions):
+            register_map().observe_many(transactions, per_transaction=True)
+
+        yield Benchmark(f"observe/{suffix}", len(transactions), observe)
+        yield Benchmark(f"observe_many/{suffix}", len(transactions), observe_many)
+        yield Benchmark(f"observe_many_flat/{suffix}", len(transactions), observe_many_flat)
+        yield Benchmark(f"observe_many_per_transaction/{suffix}", len(transactions), observe_many_per_transaction)
+
+        reg_map = register_map()
+        reg_map.observe_many(
+            (register.address, bytes(register.address_width * address_byte_width)) for register in registers
+        )
+        rng = random.Random(i)
+        sample = [rng.choice(registers) for _ in range(operations)]
+
+        def deserialize(reg_map=reg_map, sample=sample):
+            deserialize = reg_map.deserialize
+            for register in sample:
+                deserialize(register)
+
+        yield Benchmark(f"deserialize/{suffix}", len(sample), deserialize)
+
+        addresses = [rng.randrange(register_map._address_max + 1) for _ in range(operations)]
+
+        def register_containing(register_map=register_map, addresses=addresses):
+            register_containing = register_map.register_containing
+            for address in addresses:
+                register_containing(address)
+
+        def registers_intersecting(register_map=register_map, addresses=addresses):
+            registers_intersecting = register_map.registers_intersecting
+            for address in addresses:
+                registers_intersecting(slice(address, address + 8))
+
+        yield Benchmark(f"register_containing/{suffix}", len(addresses), register_containing)
+        yield Benchmark(f"registers_intersecting/{suffix}", len(addresses), registers_intersecting)
+
+
+def run_benchmarks(
+    suite: Iterator[Benchmark], repeats: int = 5, progress: Optional[Callable[[str, float], None]] = None
+) -> Dict[str, Any]:
+    """
+    Times each benchmark, taking the fastest of several repeats to filter out noise.
+
+    :param progress: Called with the name and time per operation of each benchmark as it finishes.
+    :returns: A JSON serializable report, holding the time per operation of each benchmark in seconds.
+    """
+
+    results = {}
+    for benchmark in suite:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            benchmark.run()
+            best = min(best, time.perf_counter() - start)
+        seconds_per_operation = best / benchmark.operations
+        results[benchmark.name] = {"seconds_per_operation": seconds_per_operation, "operations": benchmark.operations}
+        if progress is not None:
+            progress(benchmark.name, seconds_per_operation)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Comparison]:
+    """
+    Compares the benchmarks present in both reports.
+
+    :param threshold: The fraction by which a benchmark must slow down to count as a regression.
+    :returns: A comparison of each benchmark, in the order of the current report.
+    """
+
+    comparisons = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        baseline_time = baseline["results"][name]["seconds_per_operation"]
+        current_time = result["seconds_per_operation"]
+        ratio = current_time / baseline_time if baseline_time > 0 else float("inf")
+        comparisons.append(Comparison(name, baseline_time, current_time, ratio, ratio > 1 + threshold))
+    return comparisons
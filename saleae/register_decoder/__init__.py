@@ -1 +1,7 @@
-from .register_map import RegisterMap, Register, ByteOrder
+from .register_map import RegisterMap, Register, Field, ByteOrder, ChangeTracking, LookupStrategy
+from .loaders import register_map_from_schema, load_json, load_svd
+from .history import TransactionHistory
+from .instrumentation import Instrumentation
+from .replay import replay_capture, decoded_changes
+from .bus import BusAdapter, BusFrame, RegisterEvent
+from .subscriptions import ChangeFeed, Subscription, ChangeEvent, Overflow
@@ -0,0 +1,149 @@
+"""
+Decoding of register accesses from raw bus frames, such as I2C or SPI transfers.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Iterable, Iterator, NamedTuple, Any
+
+from .register_map import RegisterMap, Register, ByteOrder, RegisterNotObserved
+
+
+class BusFrame(NamedTuple):
+    """
+    One transfer on the bus, such as the bytes between an I2C start and the next start or stop, or the bytes exchanged
+    while an SPI chip select was asserted.
+
+    :ivar read: Whether the device sent the data, rather than received it.
+    :ivar data: The bytes transferred.
+    :ivar timestamp: When the transfer happened, if known.
+    """
+
+    read: bool
+    data: bytes
+    timestamp: Optional[float] = None
+
+
+class RegisterEvent(NamedTuple):
+    """
+    A register observed by a bus transfer.
+
+    :ivar register: The register observed.
+    :ivar value: The register's value after the transfer.
+    :ivar read: Whether the register was read, rather than written.
+    :ivar timestamp: The timestamp of the transfer.
+    """
+
+    register: Register
+    value: Any
+    read: bool
+    timestamp: Optional[float]
+
+
+class BusAdapter:
+    """
+    Turns the frames of a register based bus protocol into transactions on a :py:class:`~.RegisterMap`\\ .
+
+    Devices like this keep a register pointer. Writes start with the new value of the pointer, followed by any data to
+    write from that address onwards. Reads return data from the pointer onwards. Each address transferred advances the
+    pointer, wrapping back around once it reaches the end of the register map.
+
+    :param register_map: The register map to observe transactions with.
+    :param pointer_width: The number of bytes in the register pointer.
+    :param pointer_byte_order: The byte order of the register pointer.
+    :param pointer_mask: Bits of the register pointer that hold the address, when it also holds flags such as an SPI
+        read bit. Defaults to all of them.
+    :param pointer_in_reads: Whether reads also start with the register pointer, as with SPI devices which take the
+        address and direction at the start of every transfer.
+    :param auto_increment: Whether the pointer advances after each address, rather than every address of a transfer
+        going to the same register.
+    :param wrap_at: The address at which the pointer wraps around. Defaults to the end of the register map.
+    :param wrap_to: The address the pointer wraps around to.
+    """
+
+    register_map: RegisterMap
+    # The address the next transfer starts at, or None until a pointer has been written
+    pointer: Optional[int]
+
+    def __init__(
+        self,
+        register_map: RegisterMap,
+        *,
+        pointer_width: int = 1,
+        pointer_byte_order: ByteOrder = ByteOrder.BIG,
+        pointer_mask: Optional[int] = None,
+        pointer_in_reads: bool = False,
+        auto_increment: bool = True,
+        wrap_at: Optional[int] = None,
+        wrap_to: int = 0,
+    ):
+        if pointer_width < 1:
+            raise ValueError("pointer_width must be at least 1")
+        if wrap_at is None:
+            wrap_at = register_map._address_max
+        if not 0 <= wrap_to < wrap_at:
+            raise ValueError("wrap_to must be below wrap_at")
+
+        self.register_map = register_map
+        self.pointer = None
+        self._pointer_width = pointer_width
+        self._pointer_byte_order = pointer_byte_order
+        self._pointer_mask = pointer_mask
+        self._pointer_in_reads = pointer_in_reads
+        self._auto_increment = auto_increment
+        self._wrap_at = wrap_at
+        self._wrap_to = wrap_to
+
+    def events(self, frames: Iterable[BusFrame]) -> Iterator[RegisterEvent]:
+        """
+        Observes each frame with the register map, as it's requested, and yields an event for each fully observed
+        register that it read or wrote. Frames are consumed one at a time, so arbitrarily long captures can be decoded
+        by passing a generator. The pointer carries over between calls, so a capture may also be fed in chunks.
+
+        Reads before any pointer has been written can't be placed, so are ignored. So are trailing bytes which don't
+        fill a whole address.
+        """
+
+        register_map = self.register_map
+        address_byte_width = register_map.address_byte_width
+        pointer_width = self._pointer_width
+        for read, data, timestamp in frames:
+            data = memoryview(data)
+            if not read or self._pointer_in_reads:
+                if len(data) < pointer_width:
+                    continue
+                pointer = int.from_bytes(data[:pointer_width], self._pointer_byte_order.value)
+                if self._pointer_mask is not None:
+                    pointer &= self._pointer_mask
+                self.pointer = pointer
+                data = data[pointer_width:]
+            if self.pointer is None:
+                continue
+
+            word_count = len(data) // address_byte_width
+            position = 0
+            while position < word_count:
+                pointer = self.pointer
+                if not self._auto_increment:
+                    run = 1
+                elif pointer < self._wrap_at:
+                    run = min(word_count - position, self._wrap_at - pointer)
+                else:
+                    run = word_count - position
+                registers = register_map.observe(
+                    pointer,
+                    data[position * address_byte_width : (position + run) * address_byte_width],
+                    timestamp,
+                )
+                position += run
+                if self._auto_increment:
+                    pointer += run
+                    self.pointer = self._wrap_to if pointer == self._wrap_at else pointer
+
+                # Decode before observing any more, so each event holds the value as of its own transaction
+                for register in registers or ():
+                    try:
+                        value = register_map.deserialize(register)
+                    except RegisterNotObserved:
+                        continue
+                    yield RegisterEvent(register, value, read, timestamp)
@@ -0,0 +1,152 @@
+"""
+Vectorized decoding of registers over whole captures. Requires NumPy.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Dict, Iterable, NamedTuple, Any
+
+import numpy as np
+
+from .register_map import RegisterMap, RegisterMapMeta, Register, ByteOrder, _flatten_transactions, _bitset_all
+
+
+class CaptureValues(NamedTuple):
+    """
+    The values a register took over a capture.
+
+    :ivar indices: The indices of the transactions that observed the register, once it had been fully observed.
+    :ivar values: The register's value after each of those transactions.
+    :ivar changed: The indices of the transactions that changed the register's value, including the one that first
+        completed its observation.
+    """
+
+    indices: np.ndarray
+    values: np.ndarray
+    changed: np.ndarray
+
+
+def decode_capture(
+    register_map: RegisterMapMeta,
+    transactions: Any,
+    data: Optional[bytes] = None,
+    offsets: Optional[Any] = None,
+    *,
+    registers: Optional[Iterable[Register[int]]] = None,
+    initial: Optional[RegisterMap] = None,
+) -> Dict[Register[int], CaptureValues]:
+    """
+    Decodes the value of integer registers after every transaction of a capture. This gives the same values as calling
+    :py:meth:`RegisterMap.observe` then :py:meth:`RegisterMap.deserialize` for each transaction, but works on whole
+    columns of transactions at once.
+
+    :param register_map: The :py:class:`~.RegisterMap` subclass describing the device.
+    :param transactions: The capture's transactions, in any of the forms accepted by
+        :py:meth:`RegisterMap.observe_many`\\ , along with ``data`` and ``offsets``\\ .
+    :param registers: The registers to decode, which must have ``value_type=int`` without a ``value_parser``\\ . Defaults
+        to every such register.
+    :param initial: The register map's state before the capture. Defaults to nothing having been observed.
+    :returns: The values of each register over the capture.
+    """
+
+    if registers is None:
+        registers = [register for register in register_map if _is_auto_int(register)]
+    for register in registers:
+        if not _is_auto_int(register):
+            raise ValueError(f"register {register.name!r} must have value_type=int without a value_parser")
+    if initial is not None and initial.__class__ is not register_map:
+        raise ValueError("initial must be an instance of register_map")
+
+    addresses, buffer, offsets = _flatten_transactions(transactions, data, offsets)
+    address_byte_width = register_map.address_byte_width
+    addresses = np.asarray(addresses, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    buffer = np.frombuffer(buffer, dtype=np.uint8)
+    lengths = np.diff(offsets)
+    if np.any(lengths < 1):
+        raise ValueError("data must be non-empty")
+    if np.any(lengths % address_byte_width != 0):
+        raise ValueError("data's length must be divisible by the address width")
+    end_addresses = addresses + lengths // address_byte_width
+    lane = np.arange(address_byte_width)
+
+    decoded = {}
+    for register in registers:
+        register_end = register.address + register.address_width
+        indices = np.flatnonzero((addresses < register_end) & (end_addresses > register.address))
+        starts = addresses[indices]
+        ends = end_addresses[indices]
+        rows = np.arange(len(indices))
+
+        # Assemble the register's raw data after each transaction one address at a time, taking each address from the
+        # most recent transaction to write it
+        raw = np.empty((len(indices), register.address_width * address_byte_width), dtype=np.uint8)
+        observed = np.ones(len(indices), dtype=bool)
+        for offset in range(register.address_width):
+            address = register.address + offset
+            last_writer = np.maximum.accumulate(np.where((starts <= address) & (ends > address), rows, -1))
+            written = last_writer >= 0
+            source = indices[np.maximum(last_writer, 0)]
+            # Rows where nothing wrote the address yet read the first transaction's data instead, and are ignored
+            positions = np.where(written, offsets[source] + (address - addresses[source]) * address_byte_width, 0)
+            columns = slice(offset * address_byte_width, (offset + 1) * address_byte_width)
+            raw[:, columns] = buffer[positions[:, None] + lane]
+
+            initial_data = _initial_address_data(initial, register, offset)
+            if initial_data is None:
+                observed &= written
+            else:
+                raw[~written, columns] = initial_data
+
+        indices = indices[observed]
+        values = _decode_integers(raw[observed], register._byte_order, register._signed)
+        changed = np.ones(len(values), dtype=bool)
+        changed[1:] = values[1:] != values[:-1]
+        if initial is not None and len(values) > 0 and initial._raw_value(register) is not None:
+            changed[0] = values[0] != initial.deserialize(register)
+        decoded[register] = CaptureValues(indices, values, indices[changed])
+    return decoded
+
+
+def _is_auto_int(register: Register) -> bool:
+    return register.value_type is int and register._value_parser is None
+
+
+def _initial_address_data(initial: Optional[RegisterMap], register: Register, offset: int) -> Optional[np.ndarray]:
+    # The data at one of a register's addresses in the initial state, or None if it wasn't observed
+    if initial is None:
+        return None
+    compact_address = initial._compiled_registers[register][0] + offset
+    if not _bitset_all(initial._internal_state_mask, compact_address, compact_address + 1):
+        return None
+    address_byte_width = initial.address_byte_width
+    return np.frombuffer(
+        initial._internal_state,
+        dtype=np.uint8,
+        count=address_byte_width,
+        offset=compact_address * address_byte_width,
+    )
+
+
+def _decode_integers(raw: np.ndarray, byte_order: ByteOrder, signed: bool) -> np.ndarray:
+    # Decodes each row of a 2-D array of bytes as one integer
+    byte_count = raw.shape[1]
+    endianness = "<" if byte_order is ByteOrder.LITTLE else ">"
+    if byte_count > 8:
+        # Too wide for NumPy's integers
+        return np.array(
+            [int.from_bytes(row.tobytes(), byteorder=byte_order.value, signed=signed) for row in raw], dtype=object
+        )
+
+    if byte_count in (1, 2, 4, 8):
+        values = np.ascontiguousarray(raw).view(f"{endianness}{'i' if signed else 'u'}{byte_count}")[:, 0]
+        return values.astype(values.dtype.newbyteorder("="))
+
+    # Widen to 8 bytes by padding the most significant end with zeros, then sign extend
+    padding = np.zeros((raw.shape[0], 8 - byte_count), dtype=np.uint8)
+    padded = np.hstack([raw, padding] if byte_order is ByteOrder.LITTLE else [padding, raw])
+    values = padded.view(f"{endianness}u8")[:, 0].astype(np.uint64)
+    if not signed:
+        return values
+    shift = np.uint64(64 - byte_count * 8)
+    return (values << shift).view(np.int64) >> np.int64(shift)
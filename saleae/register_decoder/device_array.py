@@ -0,0 +1,162 @@
+"""
+Storage of the observed state of many identical devices at once. Requires NumPy.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, List, Any
+
+import numpy as np
+
+from .register_map import (
+    RegisterMap,
+    RegisterMapMeta,
+    RegisterMapSnapshot,
+    Register,
+    RegisterNotObserved,
+    _bitset_all,
+    _store_segments,
+)
+from .capture import _decode_integers, _is_auto_int
+
+
+class DeviceArray:
+    """
+    The observed state of many devices described by the same :py:class:`~.RegisterMap` subclass, such as identical
+    sensors sharing a bus.
+
+    Rather than one register map instance per device, the state of every device is held in a single 2-D buffer with a
+    row per device, alongside a 2-D bitset of the addresses each device has observed. Each device costs its raw register
+    data plus one bit per address, and a register can be read across every device at once with :py:meth:`values`\\ .
+
+    :param register_map: The :py:class:`~.RegisterMap` subclass describing each device.
+    :param device_count: The number of devices.
+    """
+
+    register_map: RegisterMapMeta
+    # The observed state of each device, in the layout of a register map's internal state, one device per row
+    _state: np.ndarray
+    # A bitset of the compact addresses each device has observed, one device per row
+    _mask: np.ndarray
+    # Flat views of the whole of `_state` and `_mask`, which device rows are found in by offset
+    _state_view: memoryview
+    _mask_view: memoryview
+
+    def __init__(self, register_map: RegisterMapMeta, device_count: int):
+        if device_count < 0:
+            raise ValueError("device_count must not be negative")
+
+        self.register_map = register_map
+        self._state = np.zeros((device_count, register_map._compact_size * register_map.address_byte_width), np.uint8)
+        self._mask = np.zeros((device_count, (register_map._compact_size + 7) // 8), np.uint8)
+        # Flatten with NumPy, since a memoryview can't be cast when either dimension is empty
+        self._state_view = memoryview(self._state.reshape(-1))
+        self._mask_view = memoryview(self._mask.reshape(-1))
+
+    @property
+    def device_count(self) -> int:
+        return self._state.shape[0]
+
+    def observe(self, device_id: int, address: int, data: bytes) -> Optional[List[Register]]:
+        """
+        Updates one device's state with observed data, as :py:meth:`RegisterMap.observe` does.
+
+        :param device_id: The index of the device, from 0 to ``device_count - 1``\\ .
+        :returns: A list of the registers observed by this operation, or None if it was outside of the register map.
+        """
+
+        cls = self.register_map
+        address_byte_width = cls.address_byte_width
+        if len(data) < 1:
+            raise ValueError("data must be non-empty")
+        if len(data) % address_byte_width != 0:
+            raise ValueError("data's length must be divisible by the address width")
+        self._check_device(device_id)
+        end_address = address + len(data) // address_byte_width
+
+        # Ignore out of range reads/writes
+        if address >= cls._address_max:
+            return None
+
+        # Copy the data into the device's row, as `RegisterMap._store` does for a single device
+        _store_segments(
+            cls,
+            self._state_view,
+            self._mask_view,
+            address,
+            end_address,
+            data,
+            device_id * self._state.shape[1],
+            device_id * self._mask.shape[1] * 8,
+        )
+
+        left_index, right_index = cls._register_index_range(address, end_address)
+        return cls._sorted_registers[left_index:right_index]
+
+    def deserialize(self, device_id: int, register: Register) -> Any:
+        """
+        Deserializes a register of one device, as :py:meth:`RegisterMap.deserialize` does.
+        """
+
+        self._check_device(device_id)
+        compact_start, compact_stop, decode = self.register_map._compiled_registers[register]
+        # Only copy the bytes of the mask covering the register, to check them
+        first_byte = device_id * self._mask.shape[1] + (compact_start >> 3)
+        mask = bytes(self._mask_view[first_byte : first_byte + ((compact_stop + 7) >> 3) - (compact_start >> 3)])
+        if not _bitset_all(mask, compact_start & 7, compact_stop - (compact_start & ~7)):
+            raise RegisterNotObserved(f"register {register.name!r} has not been observed by device {device_id}")
+        row_bytes = self._state.shape[1]
+        return decode(self._state_view[device_id * row_bytes : (device_id + 1) * row_bytes])
+
+    def _check_device(self, device_id: int):
+        if not 0 <= device_id < self.device_count:
+            raise IndexError("device_id out of range")
+
+    def observed(self, register: Register) -> np.ndarray:
+        """
+        :returns: A boolean array of whether each device has fully observed a register.
+        """
+
+        compact_start, compact_stop, _ = self.register_map._compiled_registers[register]
+        first_byte = compact_start >> 3
+        bits = np.unpackbits(self._mask[:, first_byte : (compact_stop + 7) >> 3], axis=1, bitorder="little")
+        return bits[:, compact_start - first_byte * 8 : compact_stop - first_byte * 8].all(axis=1)
+
+    def raw(self, register: Register) -> np.ndarray:
+        """
+        :returns: A view of the raw data of a register for every device, with a row per device. Rows of devices which
+            haven't fully observed the register hold unspecified data.
+        """
+
+        return self._state[:, self.register_map.state_slice(register)]
+
+    def values(self, register: Register) -> np.ma.MaskedArray:
+        """
+        Deserializes a register for every device. Integer registers without a ``value_parser`` are decoded with
+        vectorized NumPy operations; others are deserialized one device at a time into an array of objects.
+
+        :returns: A masked array of the register's value for each device, masked for devices which haven't fully
+            observed it.
+        """
+
+        observed = self.observed(register)
+        raw = self.raw(register)
+        if _is_auto_int(register):
+            values = _decode_integers(raw, register._byte_order, register._signed)
+        else:
+            values = np.empty(self.device_count, dtype=object)
+            for device_id in np.flatnonzero(observed):
+                values[device_id] = register.deserialize(raw[device_id].tobytes())
+        return np.ma.masked_array(values, mask=~observed)
+
+    def device(self, device_id: int) -> RegisterMap:
+        """
+        :returns: A new register map instance holding a copy of one device's state.
+        """
+
+        self._check_device(device_id)
+        reg_map = self.register_map()
+        reg_map.restore(
+            RegisterMapSnapshot(self.register_map, self._state[device_id].tobytes(), self._mask[device_id].tobytes())
+        )
+        return reg_map
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import bisect
+from array import array
+from typing import Optional, Dict, List, Tuple, Iterator, Iterable, TypeVar
+
+from .register_map import RegisterMap, RegisterMapMeta, Register, RegisterNotObserved, _bitset_all
+
+T = TypeVar("T")
+
+# The bytes of bookkeeping recorded per transaction (timestamp, address and data offset), and per register index entry
+_TRANSACTION_OVERHEAD = 3 * 8
+_INDEX_ENTRY_OVERHEAD = 8
+
+
+class TransactionHistory:
+    """
+    Records the transactions observed by a :py:class:`~.RegisterMap`\\ , so that the value of registers at any recorded
+    time can be queried without replaying the capture.
+
+    Transactions are stored in columns: their timestamps, their addresses, and offsets into one shared buffer holding
+    all of their data. Each register also indexes the transactions that observed it. When the history grows beyond
+    ``max_bytes``\\ , the oldest transactions are evicted, and folded into the state the remaining history builds on.
+
+    A history records transactions for a single register map, which is given by passing it as the ``history`` of a
+    :py:class:`~.RegisterMap`\\ .
+
+    :param max_bytes: The approximate amount of memory the history may use, including its indexes. Unbounded by
+        default.
+    """
+
+    max_bytes: Optional[int]
+    _register_map: Optional[RegisterMapMeta]
+    # The state observed by evicted transactions, which the recorded transactions build on
+    _evicted_state: Optional[RegisterMap]
+    # The timestamp of the newest evicted transaction, before which the history is incomplete
+    _evicted_until: Optional[float]
+    # Columns of recorded transactions. Transactions have sequence numbers increasing from 0, with the transaction at
+    # index `i` of the columns having sequence number `_base_sequence + i`. Those at indices below `_head` have been
+    # evicted, but not yet removed from the columns.
+    _timestamps: array
+    _addresses: array
+    # The offset of each transaction's data in the stream of all recorded data, of which `_data` holds the part from
+    # offset `_data_base` onwards
+    _data_offsets: array
+    _data: bytearray
+    _data_base: int
+    _base_sequence: int
+    _head: int
+    # The sequence numbers of the transactions that observed each register, which may include evicted transactions
+    _register_sequences: Dict[Register, array]
+    _size: int
+
+    def __init__(self, *, max_bytes: Optional[int] = None):
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        self.max_bytes = max_bytes
+        self._register_map = None
+        self._evicted_state = None
+        self._evicted_until = None
+        self._timestamps = array("d")
+        self._addresses = array("q")
+        self._data_offsets = array("q")
+        self._data = bytearray()
+        self._data_base = 0
+        self._base_sequence = 0
+        self._head = 0
+        self._register_sequences = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        """
+        :returns: The number of transactions currently recorded.
+        """
+
+        return len(self._timestamps) - self._head
+
+    @property
+    def latest_timestamp(self) -> Optional[float]:
+        """
+        The timestamp of the most recently recorded transaction, or None if none have been recorded.
+        """
+
+        if len(self._timestamps) == self._head:
+            return None
+        return self._timestamps[-1]
+
+    def transactions(
+        self, start: Optional[float] = None, stop: Optional[float] = None
+    ) -> Iterator[Tuple[float, int, bytes]]:
+        """
+        Iterates over the recorded transactions.
+
+        :param start: Only include transactions at or after this time.
+        :param stop: Only include transactions before this time.
+        :returns: An iterator of ``(timestamp, address, data)`` tuples, oldest first.
+        """
+
+        for index in range(*self._index_range(start, stop)):
+            yield self._timestamps[index], self._addresses[index], bytes(self._transaction_data(index))
+
+    def value_at(self, register: Register[T], timestamp: float) -> T:
+        """
+        Finds the value a register had at a given time, as of the last transaction recorded at or before it.
+
+        :raises RegisterNotObserved: If the register wasn't fully observed by then.
+        :raises ValueError: If transactions from that time have been evicted.
+        """
+
+        if self._evicted_until is not None and timestamp < self._evicted_until:
+            raise ValueError("transactions from before that time have been evicted from the history")
+        _, stop = self._index_range(None, timestamp, inclusive=True)
+        raw_data = self._raw_value_before(register, self._base_sequence + stop)
+        if raw_data is None:
+            raise RegisterNotObserved(f"register {register.name!r} had not been observed by then")
+        return register.deserialize(raw_data)
+
+    def values_between(
+        self, register: Register[T], start: Optional[float] = None, stop: Optional[float] = None
+    ) -> List[Tuple[float, T]]:
+        """
+        Finds the values a register took over a range of time, as of each recorded transaction that observed it.
+        Transactions after which the register still wasn't fully observed are skipped.
+
+        :param start: Only include transactions at or after this time.
+        :param stop: Only include transactions before this time.
+        :returns: A list of ``(timestamp, value)`` tuples, oldest first.
+        """
+
+        self._check_attached(register)
+        start_index, stop_index = self._index_range(start, stop)
+        sequences = self._register_sequences.get(register, array("q"))
+        first = bisect.bisect_left(sequences, self._base_sequence + start_index)
+        last = bisect.bisect_left(sequences, self._base_sequence + stop_index)
+
+        values = []
+        for sequence in sequences[first:last]:
+            raw_data = self._raw_value_before(register, sequence + 1)
+            if raw_data is not None:
+                values.append((self._timestamps[sequence - self._base_sequence], register.deserialize(raw_data)))
+        return values
+
+    def _attach(self, register_map: RegisterMapMeta):
+        if self._register_map is not None:
+            raise ValueError("a TransactionHistory can only record a single register map")
+        self._register_map = register_map
+        self._evicted_state = register_map()
+
+    def _check_attached(self, register: Register):
+        if self._register_map is None:
+            raise RuntimeError("the history must be given to a RegisterMap before it can be queried")
+        if register not in self._register_map._compiled_registers:
+            raise ValueError(f"register {register.name!r} is not part of the recorded register map")
+
+    def _check_timestamps(self, timestamps: Iterable[Optional[float]]):
+        # Raises if recording transactions with these timestamps, in order, would go back in time
+        latest = self.latest_timestamp
+        for timestamp in timestamps:
+            if timestamp is None:
+                continue
+            if latest is not None and timestamp < latest:
+                raise ValueError("timestamps must not decrease")
+            latest = timestamp
+
+    def _record(self, timestamp: Optional[float], address: int, data: bytes, registers: List[Register]):
+        # Records an in range transaction, and the registers it observed
+        if timestamp is None:
+            # Untimed transactions share the time of the transaction before them
+            timestamp = self.latest_timestamp if self.latest_timestamp is not None else 0.0
+        else:
+            self._check_timestamps((timestamp,))
+
+        sequence = self._base_sequence + len(self._timestamps)
+        self._timestamps.append(timestamp)
+        self._addresses.append(address)
+        self._data_offsets.append(self._data_base + len(self._data))
+        self._data += data
+        for register in registers:
+            sequences = self._register_sequences.get(register)
+            if sequences is None:
+                sequences = self._register_sequences[register] = array("q")
+            sequences.append(sequence)
+        self._size += _TRANSACTION_OVERHEAD + len(data) + _INDEX_ENTRY_OVERHEAD * len(registers)
+
+        if self.max_bytes is not None:
+            # Always keep the newest transaction
+            while self._size > self.max_bytes and len(self) > 1:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        index = self._head
+        address = self._addresses[index]
+        data = bytes(self._transaction_data(index))
+        registers = self._evicted_state.observe(address, data)
+        self._evicted_until = self._timestamps[index]
+        self._size -= _TRANSACTION_OVERHEAD + len(data) + _INDEX_ENTRY_OVERHEAD * len(registers)
+        self._head += 1
+
+        # Only remove evicted transactions once they make up half of the columns, so eviction takes amortized constant
+        # time
+        if self._head * 2 >= len(self._timestamps):
+            head = self._head
+            data_removed = (
+                self._data_offsets[head] - self._data_base if head < len(self._timestamps) else len(self._data)
+            )
+            del self._timestamps[:head]
+            del self._addresses[:head]
+            del self._data_offsets[:head]
+            del self._data[:data_removed]
+            self._data_base += data_removed
+            self._base_sequence += head
+            self._head = 0
+            for register, sequences in list(self._register_sequences.items()):
+                del sequences[: bisect.bisect_left(sequences, self._base_sequence)]
+                if not sequences:
+                    del self._register_sequences[register]
+
+    def _index_range(self, start: Optional[float], stop: Optional[float], inclusive: bool = False) -> Tuple[int, int]:
+        # The range of column indices of recorded transactions at or after `start`, and before (or at, if inclusive)
+        # `stop`
+        start_index = self._head
+        if start is not None:
+            start_index = bisect.bisect_left(self._timestamps, start, lo=self._head)
+        stop_index = len(self._timestamps)
+        if stop is not None:
+            search = bisect.bisect_right if inclusive else bisect.bisect_left
+            stop_index = search(self._timestamps, stop, lo=self._head)
+        return start_index, max(start_index, stop_index)
+
+    def _transaction_data(self, index: int) -> memoryview:
+        start = self._data_offsets[index] - self._data_base
+        if index + 1 < len(self._data_offsets):
+            stop = self._data_offsets[index + 1] - self._data_base
+        else:
+            stop = len(self._data)
+        return memoryview(self._data)[start:stop]
+
+    def _raw_value_before(self, register: Register, stop_sequence: int) -> Optional[bytes]:
+        # Reconstructs a register's raw data after the recorded transactions with sequence numbers below
+        # `stop_sequence`, or returns None if it wasn't fully observed by then
+        self._check_attached(register)
+        address_byte_width = self._register_map.address_byte_width
+        raw_data = bytearray(register.address_width * address_byte_width)
+        # Whether each of the register's addresses has been filled in yet
+        missing = bytearray(b"\x01") * register.address_width
+        missing_count = register.address_width
+
+        # Walk back through the transactions that observed the register, filling in the addresses that later
+        # transactions didn't already
+        sequences = self._register_sequences.get(register, array("q"))
+        first = bisect.bisect_left(sequences, self._base_sequence + self._head)
+        position = bisect.bisect_left(sequences, stop_sequence)
+        register_end = register.address + register.address_width
+        while missing_count and position > first:
+            position -= 1
+            index = sequences[position] - self._base_sequence
+            address = self._addresses[index]
+            data = self._transaction_data(index)
+            start = max(address, register.address)
+            stop = min(address + len(data) // address_byte_width, register_end)
+            for target in range(start, stop):
+                offset = target - register.address
+                if missing[offset]:
+                    missing[offset] = 0
+                    missing_count -= 1
+                    source = (target - address) * address_byte_width
+                    raw_data[offset * address_byte_width : (offset + 1) * address_byte_width] = data[
+                        source : source + address_byte_width
+                    ]
+
+        if missing_count:
+            # Take the rest from the state left by evicted transactions
+            evicted_state = self._evicted_state
+            compact_start, _, _ = evicted_state._compiled_registers[register]
+            for offset in range(register.address_width):
+                if missing[offset]:
+                    if not _bitset_all(
+                        evicted_state._internal_state_mask, compact_start + offset, compact_start + offset + 1
+                    ):
+                        return None
+                    source = (compact_start + offset) * address_byte_width
+                    raw_data[offset * address_byte_width : (offset + 1) * address_byte_width] = (
+                        evicted_state._internal_state[source : source + address_byte_width]
+                    )
+        return bytes(raw_data)
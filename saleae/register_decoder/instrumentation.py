@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import time
+from typing import Optional, Dict, List, Callable, Any
+
+from .register_map import RegisterMap, Register, _flatten_transactions
+
+# The instance attributes installed on an instrumented register map, shadowing the class's
+_INSTRUMENTED_ATTRIBUTES = (
+    "observe",
+    "observe_many",
+    "_apply",
+    "deserialize",
+    "deserialize_all",
+    "_compiled_registers",
+)
+
+
+class Instrumentation:
+    """
+    Counts how a :py:class:`~.RegisterMap` is used: how often each register is observed and deserialized, how many
+    transactions are dropped for starting outside of the register map or clamped for extending past its end, and how
+    long is spent in ``value_parser`` callbacks.
+
+    Instrumentation is enabled by passing it as the ``instrumentation`` of a :py:class:`~.RegisterMap`\\ , which replaces
+    that register map's methods with counting versions. Register maps without instrumentation run the original methods,
+    so pay no overhead at all.
+
+    :param callback: Called with the statistics, as returned by :py:meth:`stats`\\ , after every ``report_every``
+        transactions.
+    :param report_every: How many transactions to observe between calls of ``callback``\\ .
+    """
+
+    _register_map: Optional[RegisterMap]
+    _callback: Optional[Callable[[Dict[str, Any]], None]]
+    _report_every: Optional[int]
+    # Registers in address order, and the number of times each was observed and deserialized
+    _registers: List[Register]
+    _observe_counts: List[int]
+    _deserialize_counts: List[int]
+    # The number of transactions applied to the register map, which excludes dropped transactions
+    _applied: int
+    _dropped: int
+    _clamped: int
+    _parser_calls: int
+    _parser_seconds: float
+
+    def __init__(
+        self,
+        *,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        report_every: Optional[int] = None,
+    ):
+        if (callback is None) != (report_every is None):
+            raise ValueError("callback and report_every must be given together")
+        if report_every is not None and report_every < 1:
+            raise ValueError("report_every must be at least 1")
+
+        self._register_map = None
+        self._callback = callback
+        self._report_every = report_every
+        self._registers = []
+        self._observe_counts = []
+        self._deserialize_counts = []
+        self.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Exports the statistics gathered so far.
+
+        :returns: A dict of:
+
+            * ``transactions``\\ : The number of transactions observed.
+            * ``dropped``\\ : How many of them started outside of the register map, so were ignored.
+            * ``clamped``\\ : How many of them extended past the end of the register map, so were partly ignored.
+            * ``observed``\\ : The number of transactions that observed each register, by register name.
+            * ``deserialized``\\ : The number of times each register was deserialized, by register name.
+            * ``parser_calls``\\ : The number of calls to ``value_parser`` callbacks.
+            * ``parser_seconds``\\ : The total time spent in ``value_parser`` callbacks.
+
+            Registers which were never observed or deserialized are left out.
+        """
+
+        return {
+            "transactions": self._applied + self._dropped,
+            "dropped": self._dropped,
+            "clamped": self._clamped,
+            "observed": {
+                register.name: count for register, count in zip(self._registers, self._observe_counts) if count
+            },
+            "deserialized": {
+                register.name: count for register, count in zip(self._registers, self._deserialize_counts) if count
+            },
+            "parser_calls": self._parser_calls,
+            "parser_seconds": self._parser_seconds,
+        }
+
+    def reset(self):
+        """
+        Resets every statistic to zero.
+        """
+
+        self._observe_counts[:] = [0] * len(self._registers)
+        self._deserialize_counts[:] = [0] * len(self._registers)
+        self._applied = 0
+        self._dropped = 0
+        self._clamped = 0
+        self._parser_calls = 0
+        self._parser_seconds = 0.0
+
+    def _attach(self, register_map: RegisterMap):
+        if self._register_map is not None:
+            raise ValueError("an Instrumentation can only instrument a single register map")
+        self._register_map = register_map
+        cls = register_map.__class__
+        self._registers = list(cls._sorted_registers)
+        self.reset()
+
+        register_indices = {register: index for index, register in enumerate(self._registers)}
+        observe_counts = self._observe_counts
+        deserialize_counts = self._deserialize_counts
+        address_max = cls._address_max
+        apply = register_map._apply
+        observe = register_map.observe
+        observe_many = register_map.observe_many
+        deserialize = register_map.deserialize
+        deserialize_all = register_map.deserialize_all
+
+        def instrumented_apply(address, end_address, data, timestamp=None):
+            left_index, right_index = apply(address, end_address, data, timestamp)
+            self._applied += 1
+            if end_address > address_max:
+                self._clamped += 1
+            for index in range(left_index, right_index):
+                observe_counts[index] += 1
+            if self._report_every is not None and self._applied % self._report_every == 0:
+                self._callback(self.stats())
+            return left_index, right_index
+
+        def instrumented_observe(address, data, timestamp=None):
+            registers = observe(address, data, timestamp)
+            if registers is None:
+                self._dropped += 1
+            return registers
+
+        def instrumented_observe_many(transactions, data=None, offsets=None, **kwargs):
+            # Flatten the transactions up front to count them, which the original then passes straight through
+            addresses, buffer, offsets = _flatten_transactions(transactions, data, offsets)
+            applied = self._applied
+            result = observe_many(addresses, buffer, offsets, **kwargs)
+            self._dropped += len(addresses) - (self._applied - applied)
+            return result
+
+        def instrumented_deserialize(register):
+            value = deserialize(register)
+            deserialize_counts[register_indices[register]] += 1
+            return value
+
+        def instrumented_deserialize_all():
+            values = deserialize_all()
+            for register in values:
+                deserialize_counts[register_indices[register]] += 1
+            return values
+
+        def timed(decode):
+            def timed_decode(buffer):
+                start = time.perf_counter()
+                try:
+                    return decode(buffer)
+                finally:
+                    self._parser_seconds += time.perf_counter() - start
+                    self._parser_calls += 1
+
+            return timed_decode
+
+        register_map._apply = instrumented_apply
+        register_map.observe = instrumented_observe
+        register_map.observe_many = instrumented_observe_many
+        register_map.deserialize = instrumented_deserialize
+        register_map.deserialize_all = instrumented_deserialize_all
+        # Only registers with a value parser pay for timing
+        register_map._compiled_registers = {
+            register: (
+                (compact_start, compact_stop, timed(decode))
+                if register._value_parser is not None
+                else (compact_start, compact_stop, decode)
+            )
+            for register, (compact_start, compact_stop, decode) in cls._compiled_registers.items()
+        }
+
+    @staticmethod
+    def _remove(register_map: RegisterMap):
+        # Returns a copy of an instrumented register map to the uninstrumented methods
+        for attribute in _INSTRUMENTED_ATTRIBUTES:
+            register_map.__dict__.pop(attribute, None)
+        register_map._instrumentation = None
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import gc
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+from array import array
+from typing import Optional, Dict, List, Tuple, Union, Any, Iterator
+import xml.etree.ElementTree as ElementTree
+
+from .register_map import RegisterMap, RegisterMapMeta, Register, Field, ByteOrder
+
+# Bump whenever the format of cached register maps changes, so stale caches are ignored
+_CACHE_FORMAT_VERSION = 4
+
+_VALUE_TYPES = {"bytes": bytes, "int": int, "str": str}
+_BYTE_ORDERS = {None: None, **{byte_order.value: byte_order for byte_order in ByteOrder}}
+
+# A field, as `(name, offset, width, signed, enum, description)` where `enum` maps values to names
+_FieldSpec = Tuple[str, int, int, bool, Optional[Dict[int, str]], Optional[str]]
+# A register, as `(name, address, address_width, description, value_type, byte_order, signed, text_encoding, fields)`
+# with enums and types replaced by their names, which is the form register maps are cached in
+_RegisterSpec = Tuple[
+    str, int, int, Optional[str], str, Optional[str], Optional[bool], Optional[str], Tuple[_FieldSpec, ...]
+]
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+# The attributes every register map instance sets, which registers can't be named after any more than the attributes
+# of the RegisterMap class
+_REGISTER_MAP_INSTANCE_ATTRIBUTES = frozenset(vars(RegisterMap()))
+
+
+def register_map_from_schema(schema: Dict[str, Any]) -> RegisterMapMeta:
+    """
+    Creates a :py:class:`~.RegisterMap` subclass from a JSON-style schema, of the form::
+
+        {
+            "name": "MyRegMap",
+            "address_byte_width": 1,
+            "registers": [
+                {"name": "status", "address": 0, "description": "Status of device"},
+                {"name": "count", "address": 1, "address_width": 2, "value_type": "int", "byte_order": "little", "signed": false},
+                {"name": "model", "address": 3, "address_width": 4, "value_type": "str", "text_encoding": "ascii"},
+                {
+                    "name": "control", "address": 7, "value_type": "int", "byte_order": "little", "signed": false,
+                    "fields": [{"name": "mode", "offset": 0, "width": 2, "enum": {"0": "off", "1": "on"}}]
+                }
+            ]
+        }
+
+    Registers accept the same options as :py:class:`~.Register`\\ , except ``value_parser``\\ . Fields accept the
+    same options as :py:class:`~.Field`\\ , with ``enum`` mapping values to names.
+    """
+
+    name, address_byte_width, register_specs = _parse_schema(schema)
+    return _create_register_map(name, address_byte_width, register_specs)
+
+
+def load_json(path: PathLike, *, cache_dir: Optional[PathLike] = None) -> RegisterMapMeta:
+    """
+    Creates a :py:class:`~.RegisterMap` subclass from a JSON file holding a schema, as described in
+    :py:func:`register_map_from_schema`\\ .
+
+    :param cache_dir: A directory to cache the compiled register map in, so that loading the same file again skips
+        parsing it.
+    """
+
+    return _load(path, "json", {}, cache_dir, lambda source: _parse_schema(json.loads(source)))
+
+
+def load_svd(
+    path: PathLike, *, peripheral: Optional[str] = None, cache_dir: Optional[PathLike] = None
+) -> RegisterMapMeta:
+    """
+    Creates a :py:class:`~.RegisterMap` subclass from a CMSIS-SVD device description.
+
+    Registers are placed at their absolute addresses and decode as unsigned integers in the device's endianness. When
+    describing a whole device, each register is named after its peripheral, e.g. ``GPIOA_MODER``\\ .
+
+    Alternate registers, register groups and clusters, which describe the same addresses as another register under a
+    different layout, are skipped, since registers can't overlap. So are alternate peripherals, unless one is loaded as
+    the ``peripheral``\\ .
+
+    :param peripheral: The name of a single peripheral to load, rather than the whole device.
+    :param cache_dir: A directory to cache the compiled register map in, so that loading the same file again skips
+        parsing it.
+    """
+
+    return _load(
+        path, "svd", {"peripheral": peripheral}, cache_dir, lambda source: _parse_svd(source, peripheral=peripheral)
+    )
+
+
+def _load(path: PathLike, kind: str, options: Dict[str, Any], cache_dir: Optional[PathLike], parse) -> RegisterMapMeta:
+    with open(path, "rb") as file:
+        source = file.read()
+    if cache_dir is None:
+        return _create_register_map(*parse(source))
+
+    # Key the cache on everything that affects the compiled register map
+    key = hashlib.sha256()
+    key.update(repr((_CACHE_FORMAT_VERSION, sys.version_info[:2], kind, sorted(options.items()))).encode())
+    key.update(source)
+    cache_path = os.path.join(cache_dir, key.hexdigest() + ".regmap")
+
+    # Installing a cached register map allocates many objects without creating any garbage, so the garbage collector
+    # would only spend its time scanning them
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(cache_path, "rb") as file:
+            # Reading the whole file first is much faster than letting marshal read it piecemeal
+            name, address_byte_width, register_specs, layout = marshal.loads(file.read())
+        return _install_cached_register_map(name, address_byte_width, register_specs, layout)
+    except Exception:
+        # Whatever is wrong with a cached entry, rebuilding it from the source replaces it
+        pass
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    register_map = _create_register_map(*parse(source))
+    _write_cache(cache_path, register_map)
+    return register_map
+
+
+def _install_cached_register_map(
+    name: str, address_byte_width: int, register_specs: List[_RegisterSpec], layout: Tuple
+) -> RegisterMapMeta:
+    # Creates a register map class from a cache entry. Its registers already passed validation when it was written, and
+    # are sorted and free of overlaps, so they're created without checks and the cached address map is installed rather
+    # than built.
+    namespace = {"address_byte_width": address_byte_width}
+    registers = []
+    for register_spec in register_specs:
+        register_name, address, address_width, description, value_type, byte_order, signed, text_encoding, fields = (
+            register_spec
+        )
+        register = Register._unchecked(
+            address,
+            address_width,
+            description,
+            _VALUE_TYPES[value_type],
+            _BYTE_ORDERS[byte_order],
+            signed,
+            text_encoding,
+            [
+                Field(field_name, offset, width, signed=field_signed, enum=enum, description=field_description)
+                for field_name, offset, width, field_signed, enum, field_description in fields
+            ],
+        )
+        namespace[register_name] = register
+        registers.append(register)
+    segment_starts, segment_stops, segment_bases, compact_starts, lookup_table = layout
+    if lookup_table:
+        table = array("I")
+        table.frombytes(lookup_table)
+    else:
+        # An empty table stands for bisection
+        table = None
+    register_map = RegisterMapMeta(name, (RegisterMap,), namespace, lazy=True)
+    register_map._index_registers(registers, (segment_starts, segment_stops, segment_bases, compact_starts, table))
+    return register_map
+
+
+def _create_register_map(name: str, address_byte_width: int, register_specs: List[_RegisterSpec]) -> RegisterMapMeta:
+    namespace = {"address_byte_width": address_byte_width}
+    for register_spec in register_specs:
+        register_name, address, address_width, description, value_type, byte_order, signed, text_encoding, fields = (
+            register_spec
+        )
+        if hasattr(RegisterMap, register_name) or register_name in _REGISTER_MAP_INSTANCE_ATTRIBUTES:
+            raise ValueError(f"register name {register_name!r} clashes with an attribute of RegisterMap")
+        if register_name in namespace:
+            raise ValueError(f"duplicate register name {register_name!r}")
+        namespace[register_name] = Register(
+            address,
+            description=description,
+            address_width=address_width,
+            value_type=_VALUE_TYPES[value_type],
+            byte_order=ByteOrder(byte_order) if byte_order is not None else None,
+            signed=signed,
+            text_encoding=text_encoding,
+            fields=[
+                Field(field_name, offset, width, signed=field_signed, enum=enum, description=field_description)
+                for field_name, offset, width, field_signed, enum, field_description in fields
+            ],
+        )
+    return RegisterMapMeta(name, (RegisterMap,), namespace)
+
+
+def _write_cache(cache_path: str, register_map: RegisterMapMeta):
+    register_specs = [
+        (
+            register.name,
+            register.address,
+            register.address_width,
+            register.description,
+            register.value_type.__name__,
+            register._byte_order.value if register._byte_order is not None else None,
+            register._signed,
+            register._text_encoding,
+            tuple(
+                (field.name, field.offset, field.width, field.signed, field.enum, field.description)
+                for field in register.fields.values()
+            ),
+        )
+        for register in register_map
+    ]
+    segment_starts, segment_stops, segment_bases, compact_starts, lookup_table = register_map._export_layout()
+    # An empty table stands for bisection, which has nothing to cache
+    layout = (
+        segment_starts,
+        segment_stops,
+        segment_bases,
+        compact_starts,
+        lookup_table.tobytes() if lookup_table is not None else b"",
+    )
+    compiled = (register_map.__name__, register_map.address_byte_width, register_specs, layout)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write then rename, so a concurrently loading process never sees a partial file
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        marshal.dump(compiled, file)
+    os.replace(temporary_path, cache_path)
+
+
+def _parse_schema(schema: Dict[str, Any]) -> Tuple[str, int, List[_RegisterSpec]]:
+    register_specs = []
+    for register in schema.get("registers", []):
+        value_type = register.get("value_type", "bytes")
+        if value_type not in _VALUE_TYPES:
+            raise ValueError(f"value_type must be one of {', '.join(_VALUE_TYPES)}")
+        register_specs.append(
+            (
+                register["name"],
+                register["address"],
+                register.get("address_width", 1),
+                register.get("description"),
+                value_type,
+                register.get("byte_order"),
+                register.get("signed"),
+                register.get("text_encoding"),
+                tuple(
+                    (
+                        field["name"],
+                        field["offset"],
+                        field.get("width", 1),
+                        field.get("signed", False),
+                        {int(value, 0): name for value, name in field["enum"].items()} if "enum" in field else None,
+                        field.get("description"),
+                    )
+                    for field in register.get("fields", [])
+                ),
+            )
+        )
+    return schema.get("name", "RegisterMap"), schema.get("address_byte_width", 1), register_specs
+
+
+def _parse_svd(source: bytes, *, peripheral: Optional[str] = None) -> Tuple[str, int, List[_RegisterSpec]]:
+    device = ElementTree.fromstring(source)
+    address_unit_bits = _svd_int(device.findtext("addressUnitBits"), 8)
+    if address_unit_bits % 8 != 0:
+        raise ValueError("addressUnitBits must be a multiple of 8")
+    byte_order = "big" if device.findtext("cpu/endian", "little").strip() == "big" else "little"
+    default_size = _svd_int(device.findtext("size"), 32)
+
+    peripherals = {element.findtext("name").strip(): element for element in device.iterfind("peripherals/peripheral")}
+    if peripheral is not None and peripheral not in peripherals:
+        raise ValueError(f"no peripheral named {peripheral!r}")
+
+    register_specs = []
+    for peripheral_name, element in peripherals.items():
+        if peripheral is not None and peripheral_name != peripheral:
+            continue
+        if peripheral is None and element.find("alternatePeripheral") is not None:
+            continue
+        base_address = _svd_int(element.findtext("baseAddress"), 0)
+        size = _svd_int(element.findtext("size"), default_size)
+        # Derived peripherals reuse the registers of the peripheral they derive from at their own base address
+        registers_element = element.find("registers")
+        if registers_element is None and element.get("derivedFrom") is not None:
+            registers_element = peripherals[element.get("derivedFrom")].find("registers")
+        if registers_element is None:
+            continue
+
+        prefix = "" if peripheral is not None else peripheral_name + "_"
+        for name, address, register_size, description, fields in _svd_registers(registers_element, base_address, size):
+            if register_size % address_unit_bits != 0:
+                raise ValueError(f"the size of register {name} is not a whole number of addresses")
+            register_specs.append(
+                (
+                    _identifier(prefix + name),
+                    address,
+                    register_size // address_unit_bits,
+                    description,
+                    "int",
+                    byte_order,
+                    False,
+                    None,
+                    fields,
+                )
+            )
+
+    name = peripheral if peripheral is not None else device.findtext("name", "Device").strip()
+    return _identifier(name), address_unit_bits // 8, register_specs
+
+
+def _svd_registers(
+    parent: ElementTree.Element, base_address: int, size: int
+) -> Iterator[Tuple[str, int, int, Optional[str], Tuple[_FieldSpec, ...]]]:
+    # Yields `(name, address, size, description, fields)` for the registers under a `registers` or `cluster` element,
+    # expanding clusters and arrays
+    for element in parent:
+        if element.tag not in ("register", "cluster"):
+            continue
+        if any(element.find(tag) is not None for tag in _SVD_ALTERNATE_TAGS):
+            continue
+        element_size = _svd_int(element.findtext("size"), size)
+        for name, address in _svd_dim(element, base_address + _svd_int(element.findtext("addressOffset"), 0)):
+            if element.tag == "register":
+                yield name, address, element_size, _svd_description(element), _svd_fields(element)
+            else:
+                for register_name, register_address, register_size, description, fields in _svd_registers(
+                    element, address, element_size
+                ):
+                    yield f"{name}_{register_name}", register_address, register_size, description, fields
+
+
+# Tags marking an element as an alternate view of addresses that another element already describes
+_SVD_ALTERNATE_TAGS = ("alternateRegister", "alternateGroup", "alternateCluster")
+
+
+def _svd_fields(register: ElementTree.Element) -> Tuple[_FieldSpec, ...]:
+    fields = []
+    for element in register.iterfind("fields/field"):
+        # Bit positions may be given in any one of three styles
+        if element.find("bitOffset") is not None:
+            offset = _svd_int(element.findtext("bitOffset"), 0)
+            width = _svd_int(element.findtext("bitWidth"), 1)
+        elif element.find("lsb") is not None:
+            offset = _svd_int(element.findtext("lsb"), 0)
+            width = _svd_int(element.findtext("msb"), offset) - offset + 1
+        else:
+            msb, lsb = re.fullmatch(r"\s*\[(\w+):(\w+)\]\s*", element.findtext("bitRange")).groups()
+            offset = _svd_int(lsb, 0)
+            width = _svd_int(msb, 0) - offset + 1
+
+        enum = {
+            _svd_int(value.findtext("value"), 0): value.findtext("name").strip()
+            for value in element.iterfind("enumeratedValues/enumeratedValue")
+            if value.find("value") is not None
+        }
+        fields.append(
+            (
+                _identifier(element.findtext("name").strip()),
+                offset,
+                width,
+                False,
+                enum or None,
+                _svd_description(element),
+            )
+        )
+    return tuple(fields)
+
+
+def _svd_description(element: ElementTree.Element) -> Optional[str]:
+    description = element.findtext("description")
+    return " ".join(description.split()) if description else None
+
+
+def _svd_dim(element: ElementTree.Element, address: int) -> Iterator[Tuple[str, int]]:
+    # Yields `(name, address)` for each instance of an element, which is an array when it has a `dim`
+    name = element.findtext("name").strip()
+    dim = element.findtext("dim")
+    if dim is None:
+        yield name, address
+        return
+
+    increment = _svd_int(element.findtext("dimIncrement"), 0)
+    dim_index = element.findtext("dimIndex")
+    if dim_index is None:
+        indices = [str(index) for index in range(_svd_int(dim, 0))]
+    elif re.fullmatch(r"\s*\d+\s*-\s*\d+\s*", dim_index):
+        first, last = (int(bound) for bound in dim_index.split("-"))
+        indices = [str(index) for index in range(first, last + 1)]
+    elif re.fullmatch(r"\s*[A-Za-z]\s*-\s*[A-Za-z]\s*", dim_index):
+        first, last = (ord(bound.strip()) for bound in dim_index.split("-"))
+        indices = [chr(index) for index in range(first, last + 1)]
+    else:
+        indices = [index.strip() for index in dim_index.split(",")]
+    for i, index in enumerate(indices):
+        yield name.replace("[%s]", index).replace("%s", index), address + i * increment
+
+
+def _svd_int(text: Optional[str], default: int) -> int:
+    if text is None:
+        return default
+    text = text.strip().lower()
+    if text.startswith("#"):
+        # Binary, possibly with "x" don't-care bits
+        return int(text[1:].replace("x", "0"), 2)
+    return int(text, 0)
+
+
+def _identifier(name: str) -> str:
+    name = re.sub(r"\W", "_", name)
+    return "_" + name if name[:1].isdigit() else name
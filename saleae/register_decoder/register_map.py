@@ -1,8 +1,38 @@
 from __future__ import annotations
 
+import bisect
+from collections import OrderedDict
 from enum import Enum
+import functools
 import inspect
-from typing import Optional, Dict, List, Union, Literal, Callable, Any, Iterator, Iterable, TypeVar, Generic
+import itertools
+import re
+import struct
+from array import array
+from typing import (
+    Optional,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Literal,
+    Callable,
+    Any,
+    Iterator,
+    Iterable,
+    Sequence,
+    TypeVar,
+    Generic,
+    NamedTuple,
+    Mapping,
+    Type,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from .history import TransactionHistory
+    from .instrumentation import Instrumentation
+    from .subscriptions import ChangeFeed
 
 
 class ByteOrder(Enum):
@@ -10,8 +40,154 @@ class ByteOrder(Enum):
     BIG = "big"
 
 
+class ChangeTracking(Enum):
+    """
+    Which observations count as changing a register when a :py:class:`~.RegisterMap` tracks changes.
+    """
+
+    #: Every transaction that observes a register changes it, even if its data is unchanged.
+    WRITES = "writes"
+    #: Only transactions that change a fully observed register's data, or complete its observation, change it.
+    VALUES = "values"
+
+
 T = TypeVar("T")
 
+# `struct` format characters for integers of each supported byte count, indexed by signedness
+_STRUCT_INT_FORMATS = {1: "Bb", 2: "Hh", 4: "Ii", 8: "Qq"}
+
+
+class Field:
+    """
+    Represents a bit field within the integer value of a :py:class:`~.Register`\\ .
+
+    :ivar name: The name of this field, unique within its register.
+    :ivar offset: The index of this field's least significant bit within the register's value.
+    :ivar width: The number of bits in this field.
+    :ivar signed: Whether this field holds a two's complement signed integer.
+    :ivar enum: Either an :py:class:`~enum.Enum` subclass or a mapping to translate this field's integer values with.
+        Values it doesn't cover are left as integers.
+    :ivar description: A human-readable description of this field's purpose.
+    """
+
+    name: str
+    offset: int
+    width: int
+    signed: bool
+    enum: Optional[Union[Type[Enum], Mapping[int, Any]]]
+    description: Optional[str]
+
+    def __init__(
+        self,
+        name: str,
+        offset: int,
+        width: int = 1,
+        *,
+        signed: bool = False,
+        enum: Optional[Union[Type[Enum], Mapping[int, Any]]] = None,
+        description: Optional[str] = None,
+    ):
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        if width < 1:
+            raise ValueError("width must be at least 1")
+
+        self.name = name
+        self.offset = offset
+        self.width = width
+        self.signed = signed
+        self.enum = enum
+        self.description = description
+
+    def extract(self, value: int) -> Any:
+        """
+        Extracts this field from a register's integer value.
+        """
+
+        raw = (value >> self.offset) & ((1 << self.width) - 1)
+        if self.signed and raw >> (self.width - 1):
+            raw -= 1 << self.width
+        if self.enum is None:
+            return raw
+        return _translate_enum(self.enum, raw)
+
+    def extract_array(self, values):
+        """
+        Extracts this field from each of a NumPy array of a register's integer values, without translating them with
+        ``enum``\\ .
+
+        :returns: A NumPy array of this field's values, with the same shape and item size as ``values``\\ .
+        """
+
+        import numpy as np
+
+        values = np.asarray(values)
+        if values.dtype.kind not in "iu":
+            raise TypeError("values must be an array of integers")
+        if self.offset + self.width > values.dtype.itemsize * 8:
+            raise ValueError(f"field {self.name} doesn't fit in {values.dtype.itemsize * 8} bit values")
+        # Work on the unsigned representation, so that shifting doesn't sign extend
+        unsigned_dtype = np.dtype(f"u{values.dtype.itemsize}")
+        if not self.signed:
+            return (values.view(unsigned_dtype) >> unsigned_dtype.type(self.offset)) & unsigned_dtype.type(
+                (1 << self.width) - 1
+            )
+        # Shift the field up to the top bits, then sign extend it back down with an arithmetic shift, which never
+        # overflows
+        bits = values.dtype.itemsize * 8
+        signed_dtype = np.dtype(f"i{values.dtype.itemsize}")
+        shifted = values.view(unsigned_dtype) << unsigned_dtype.type(bits - self.offset - self.width)
+        return shifted.view(signed_dtype) >> signed_dtype.type(bits - self.width)
+
+    def __repr__(self):
+        s = f"Field({self.name!r}, {self.offset!r}"
+        if self.width != 1:
+            s += f", {self.width!r}"
+        if self.signed:
+            s += ", signed=True"
+        if self.enum is not None:
+            s += f", enum={self.enum!r}"
+        if self.description is not None:
+            s += f", description={self.description!r}"
+        s += ")"
+        return s
+
+
+def _translate_enum(enum: Union[Type[Enum], Mapping[int, Any]], raw: int) -> Any:
+    if isinstance(enum, type):
+        try:
+            return enum(raw)
+        except ValueError:
+            return raw
+    return enum.get(raw, raw)
+
+
+def _compile_field_extractor(fields: List[Field]) -> Callable[[int], Dict[str, Any]]:
+    # Precomputes the shift, mask and sign handling of each field, returning a function which extracts all of them
+    # from a register's integer value
+    plans = [
+        (
+            field.name,
+            field.offset,
+            (1 << field.width) - 1,
+            1 << (field.width - 1) if field.signed else 0,
+            1 << field.width,
+            field.enum,
+        )
+        for field in fields
+    ]
+
+    def extract_fields(value: int) -> Dict[str, Any]:
+        extracted = {}
+        for name, shift, mask, sign_bit, modulus, enum in plans:
+            raw = (value >> shift) & mask
+            if raw & sign_bit:
+                raw -= modulus
+            extracted[name] = raw if enum is None else _translate_enum(enum, raw)
+        return extracted
+
+    return extract_fields
+
 
 class Register(Generic[T]):
     """
@@ -21,6 +197,7 @@ class Register(Generic[T]):
     :ivar address_width: The number of addresses that make up this register. When addresses correspond to multiple bytes, this includes that multiplier.
     :ivar description: A human-readable description of this register's purpose.
     :ivar value_type: The type of value this register produces.
+    :ivar fields: The bit fields within this register's integer value, by name.
     """
 
     address: int
@@ -31,6 +208,9 @@ class Register(Generic[T]):
     _byte_order: Optional[ByteOrder]
     _text_encoding: Optional[str]
     _signed: Optional[bool]
+    fields: Dict[str, Field]
+    # Extracts every field from the register's integer value, or None if the register has no fields
+    _extract_fields: Optional[Callable[[int], Dict[str, Any]]]
 
     def __init__(
         self,
@@ -43,6 +223,7 @@ class Register(Generic[T]):
         byte_order: Optional[ByteOrder] = None,
         signed: Optional[bool] = None,
         text_encoding: Optional[str] = None,
+        fields: Iterable[Field] = (),
     ):
         if address_width < 1:
             raise ValueError("address_width must be at least 1")
@@ -92,9 +273,46 @@ class Register(Generic[T]):
         elif text_encoding is not None:
             raise ValueError("text_encoding is only allowed when value_type=str")
 
+        self.fields = {}
+        for field in fields:
+            if field.name in self.fields:
+                raise ValueError(f"duplicate field name {field.name!r}")
+            self.fields[field.name] = field
+        if self.fields and self._byte_order is None:
+            raise ValueError("fields are only allowed when value_type=int")
+        self._extract_fields = _compile_field_extractor(list(self.fields.values())) if self.fields else None
+
         # This will be set by RegisterMap's metaclass constructor
         self._name = None
 
+    @classmethod
+    def _unchecked(
+        cls,
+        address: int,
+        address_width: int,
+        description: Optional[str],
+        value_type: type,
+        byte_order: Optional[ByteOrder],
+        signed: Optional[bool],
+        text_encoding: Optional[str],
+        fields: List[Field],
+    ) -> Register:
+        # Creates a register without a value parser from options that an earlier register already validated, such as
+        # those of a cached register map
+        register = cls.__new__(cls)
+        register.address = address
+        register.description = description
+        register.address_width = address_width
+        register.value_type = value_type
+        register._value_parser = None
+        register._byte_order = byte_order
+        register._signed = signed
+        register._text_encoding = text_encoding
+        register.fields = {field.name: field for field in fields}
+        register._extract_fields = _compile_field_extractor(fields) if fields else None
+        register._name = None
+        return register
+
     @property
     def name(self) -> str:
         if self._name is None:
@@ -111,6 +329,30 @@ class Register(Generic[T]):
         elif self.value_type is int:
             return int.from_bytes(raw_data, byteorder=self._byte_order.value, signed=self._signed)
 
+    def _compile_decoder(self, offset: int, byte_count: int) -> Callable[[bytearray], T]:
+        # Specializes `deserialize` for a register whose `byte_count` bytes of raw data start at `offset` within a
+        # buffer, returning a function that decodes the register straight out of that buffer
+        stop = offset + byte_count
+        if self._value_parser is not None:
+            value_parser = self._value_parser
+            return lambda buffer: value_parser(bytes(memoryview(buffer)[offset:stop]))
+        elif self.value_type is bytes:
+            # Slicing a memoryview rather than the buffer copies the data once rather than twice
+            return lambda buffer: bytes(memoryview(buffer)[offset:stop])
+        elif self.value_type is str:
+            text_encoding = self._text_encoding
+            return lambda buffer: str(memoryview(buffer)[offset:stop], text_encoding)
+        elif self.value_type is int:
+            if byte_count in _STRUCT_INT_FORMATS:
+                unpack_from = struct.Struct(
+                    ("<" if self._byte_order is ByteOrder.LITTLE else ">")
+                    + _STRUCT_INT_FORMATS[byte_count][self._signed]
+                ).unpack_from
+                return lambda buffer: unpack_from(buffer, offset)[0]
+            byte_order = self._byte_order.value
+            signed = self._signed
+            return lambda buffer: int.from_bytes(buffer[offset:stop], byteorder=byte_order, signed=signed)
+
     def __repr__(self):
         s = f"Register({hex(self.address)}"
         if self.description is not None:
@@ -127,90 +369,352 @@ class Register(Generic[T]):
             s += f", signed={self._signed!r}"
         if self._text_encoding is not None:
             s += f", text_encoding={self._text_encoding!r}"
+        if self.fields:
+            s += f", fields={list(self.fields.values())!r}"
         s += ")"
         return s
 
 
+# The granularity, in addresses, at which internal state is allocated for registers
+_PAGE_ADDRESSES = 256
+# Register maps spanning at most this many addresses, or whose registers cover at least one in this many of their
+# addresses, look up registers with a table indexed by address
+_LOOKUP_TABLE_MIN_ADDRESSES = 4096
+_LOOKUP_TABLE_MAX_SPARSITY = 4
+
+
+class LookupStrategy(Enum):
+    """
+    How a :py:class:`~.RegisterMap` finds the registers at an address.
+    """
+
+    #: A precomputed table with an entry per address, giving constant time lookups. Best for dense register maps.
+    TABLE = "table"
+    #: Binary search over the registers' start and end addresses. Best for sparse register maps.
+    BISECT = "bisect"
+
+
+# The attributes of a `RegisterMap` class built from its registers
+_ADDRESS_MAP_ATTRIBUTES = (
+    "_sorted_registers",
+    "_register_starts",
+    "_register_ends",
+    "_lookup_table",
+    "_address_max",
+    "_segment_starts",
+    "_segment_stops",
+    "_segment_bases",
+    "_compact_size",
+    "_dense",
+    "_compiled_registers",
+)
+
+
+class _LazyAddressMapAttribute:
+    # Stands in for an address map attribute of a lazily built `RegisterMap` class, building the address map when it's
+    # first accessed. Building replaces these placeholders with the real attributes, so there is no overhead afterwards.
+
+    def __init__(self, register_map: RegisterMapMeta, attribute: str):
+        self._register_map = register_map
+        self._attribute = attribute
+
+    def __get__(self, instance, owner):
+        self._register_map._build_address_map()
+        return getattr(self._register_map, self._attribute)
+
+
+def _overlap_error(registers: List[Register]) -> ValueError:
+    # Reports an overlap between registers given in the order they were defined in. Registers are checked one at a time
+    # in that order, and the first to overlap an earlier one is reported along with the lowest addressed earlier
+    # register it overlaps.
+    starts = []
+    ends = []
+    names = []
+    for register in registers:
+        index = bisect.bisect_right(ends, register.address)
+        if index < len(starts) and starts[index] < register.address + register.address_width:
+            return ValueError(f"the registers {register.name} and {names[index]} overlap")
+        index = bisect.bisect_left(starts, register.address)
+        starts.insert(index, register.address)
+        ends.insert(index, register.address + register.address_width)
+        names.insert(index, register.name)
+    raise AssertionError("no registers overlap")
+
+
 class RegisterMapMeta(type, Iterable[Register]):
+    """
+    The metaclass of :py:class:`~.RegisterMap`\\ , which builds the address map of each register map class.
+
+    By default, the address map is built when the class is created. Register maps with many registers may instead be
+    declared with ``class MyRegMap(RegisterMap, lazy=True)``\\ , which defers building the address map, and so
+    reporting overlapping registers, until the class is first used.
+    """
+
     # Registers sorted by address
     _sorted_registers: List[Register]
+    # One past the highest address covered by a register
+    _address_max: int
+    # The internal state only stores addresses inside segments: maximal runs of pages holding at least one register.
+    # Segment `i` covers addresses `[_segment_starts[i], _segment_stops[i])`, stored contiguously in the internal state
+    # starting from "compact address" `_segment_bases[i]`. A dense map has a single segment starting at address 0, so
+    # compact addresses and addresses are the same.
+    _segment_starts: List[int]
+    _segment_stops: List[int]
+    _segment_bases: List[int]
+    # The number of compact addresses making up the internal state
+    _compact_size: int
+    # Whether there is at most one segment and it starts at address 0
+    _dense: bool
+    # The start and end addresses of each register in `_sorted_registers`, which are both sorted since registers don't
+    # overlap
+    _register_starts: List[int]
+    _register_ends: List[int]
+    # With `LookupStrategy.TABLE`, the index of the first register ending after each address below `_address_max`
+    _lookup_table: Optional[array]
+    # For each register, in address order: the compact addresses `[start, stop)` holding its state, and a decoder
+    # compiled for its position that reads its value straight out of the internal state
+    _compiled_registers: Dict[Register, Tuple[int, int, Callable[[bytearray], Any]]]
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __new__(mcs, name, bases, namespace, lazy: bool = False):
+        return super().__new__(mcs, name, bases, namespace)
 
-        # Inherit parent class' address map, but duplicate it so we don't add entries to it
-        self._sorted_registers = list(getattr(self, "_sorted_registers", []))
+    def __init__(self, name, bases, namespace, lazy: bool = False):
+        super().__init__(name, bases, namespace)
 
         for name, value in self.__dict__.items():
             if isinstance(value, Register):
                 # Inform register objects what their assigned name is
                 value._name = name
 
-                # Ensure no existing registers overlap with this register
-                intersecting = self.registers_intersecting(slice(value.address, value.address + value.address_width))
-                if intersecting:
-                    raise ValueError(f"the registers {name} and {intersecting[0].name} overlap")
+        if lazy:
+            # Defer building the address map until one of its attributes is first used
+            for attribute in _ADDRESS_MAP_ATTRIBUTES:
+                setattr(self, attribute, _LazyAddressMapAttribute(self, attribute))
+        else:
+            self._build_address_map()
+
+    def _build_address_map(self):
+        lazy_attributes = {
+            attribute: self.__dict__[attribute]
+            for attribute in _ADDRESS_MAP_ATTRIBUTES
+            if isinstance(self.__dict__.get(attribute), _LazyAddressMapAttribute)
+        }
+        # Remove the placeholders, so that the parent class' address map can be found
+        for attribute in lazy_attributes:
+            delattr(self, attribute)
+
+        try:
+            # Inherit parent class' address map, but duplicate it so we don't add entries to it
+            registers = list(getattr(self, "_sorted_registers", []))
+            registers.extend(value for value in self.__dict__.values() if isinstance(value, Register))
+            # Registers in the order they were defined in, which decides how overlaps are reported
+            defined_registers = list(registers)
+
+            # The parent's registers are already sorted, which sorting takes advantage of
+            registers.sort(key=lambda register: register.address)
+
+            # Ensure no registers overlap. Since they're sorted, any overlap includes a pair of neighbouring registers.
+            for previous, register in zip(registers, registers[1:]):
+                if register.address < previous.address + previous.address_width:
+                    raise _overlap_error(defined_registers)
+
+            for register in registers:
+                for field in register.fields.values():
+                    if field.offset + field.width > register.address_width * self.address_byte_width * 8:
+                        raise ValueError(f"the field {field.name} extends past the end of the register {register.name}")
+        except Exception:
+            for attribute, lazy_attribute in lazy_attributes.items():
+                setattr(self, attribute, lazy_attribute)
+            raise
+
+        self._index_registers(registers)
 
-                # Insert into sorted map
-                self._sorted_registers.insert(self._register_binary_search_left(value.address), value)
+    def _index_registers(self, registers: List[Register], layout: Optional[Tuple] = None):
+        # Builds the address map from registers already sorted by address and checked for overlaps. A `layout` previously
+        # exported by `_export_layout` for the same registers is installed as is, rather than being built again.
+        self._sorted_registers = registers
+        self._register_starts = [register.address for register in registers]
+        self._register_ends = [register.address + register.address_width for register in registers]
+        if layout is None:
+            self._build_segments()
+            self._build_lookup_index()
+        else:
+            segment_starts, segment_stops, segment_bases, compact_starts, lookup_table = layout
+            self._install_segments(segment_starts, segment_stops, segment_bases, compact_starts)
+            self._build_lookup_index(lookup_table)
+
+    def _export_layout(self) -> Tuple:
+        # The parts of the address map which depend only on the registers' addresses and widths, as
+        # `(segment_starts, segment_stops, segment_bases, compact_starts, lookup_table)` where `compact_starts` holds the
+        # compact address of each register in address order
+        return (
+            self._segment_starts,
+            self._segment_stops,
+            self._segment_bases,
+            [compact_start for compact_start, _, _ in self._compiled_registers.values()],
+            self._lookup_table,
+        )
+
+    def _build_segments(self):
+        segment_starts = []
+        segment_stops = []
+        segment_bases = []
+        compact_starts = []
+        compact_size = 0
+        for register in self._sorted_registers:
+            page_start = register.address - register.address % _PAGE_ADDRESSES
+            stop = register.address + register.address_width
+            # Extend the current segment if this register's first page touches it, otherwise start a new one
+            if segment_stops and page_start <= -(-segment_stops[-1] // _PAGE_ADDRESSES) * _PAGE_ADDRESSES:
+                compact_size += stop - segment_stops[-1]
+                segment_stops[-1] = stop
+            else:
+                segment_starts.append(page_start)
+                segment_stops.append(stop)
+                segment_bases.append(compact_size)
+                compact_size += stop - page_start
+            compact_starts.append(segment_bases[-1] + register.address - segment_starts[-1])
+        self._install_segments(segment_starts, segment_stops, segment_bases, compact_starts)
+
+    def _install_segments(
+        self, segment_starts: List[int], segment_stops: List[int], segment_bases: List[int], compact_starts: List[int]
+    ):
+        # Installs the segments of the internal state, and compiles each register's decoder for its compact address
+        self._segment_starts = segment_starts
+        self._segment_stops = segment_stops
+        self._segment_bases = segment_bases
+        # Registers don't overlap, so the last one ends last
+        self._address_max = self._register_ends[-1] if self._register_ends else 0
+        self._compact_size = segment_bases[-1] + segment_stops[-1] - segment_starts[-1] if segment_starts else 0
+        self._dense = segment_starts in ([], [0])
+        address_byte_width = self.address_byte_width
+        self._compiled_registers = {
+            register: (
+                compact_start,
+                compact_start + register.address_width,
+                register._compile_decoder(
+                    compact_start * address_byte_width, register.address_width * address_byte_width
+                ),
+            )
+            for register, compact_start in zip(self._sorted_registers, compact_starts)
+        }
 
     def __iter__(self) -> Iterator[Register]:
         return iter(self._sorted_registers)
 
+    @property
+    def active_lookup_strategy(self) -> LookupStrategy:
+        """
+        The strategy used to look up registers by address: either the one requested by the class' ``lookup_strategy``,
+        or the one chosen automatically from the density of its registers.
+        """
+
+        return LookupStrategy.TABLE if self._lookup_table is not None else LookupStrategy.BISECT
+
+    def _build_lookup_index(self, lookup_table: Optional[array] = None):
+        self._lookup_table = lookup_table
+        if lookup_table is not None:
+            return
+
+        strategy = self.lookup_strategy
+        if strategy is None:
+            covered = sum(register.address_width for register in self._sorted_registers)
+            if self._address_max <= max(_LOOKUP_TABLE_MIN_ADDRESSES, covered * _LOOKUP_TABLE_MAX_SPARSITY):
+                strategy = LookupStrategy.TABLE
+            else:
+                strategy = LookupStrategy.BISECT
+
+        if strategy is LookupStrategy.TABLE:
+            # `_lookup_table[address]` is the index of the first register ending after `address`
+            self._lookup_table = array("I")
+            for index, end in enumerate(self._register_ends):
+                self._lookup_table.extend(array("I", [index]) * (end - len(self._lookup_table)))
+
     def register_containing(self, address: int) -> Optional[Register]:
         # Get the first register with `register.address + register.address_width` > given `address`. This is the only candidate for containing the
         # register, since:
         #   * Anything lower would have `register.address + register.address_width` <= `address`
         #   * Anything higher has a start address >= than this register's end address, meaning the start address > the given `address`
-        register_index = self._register_binary_search_reg_end_right(address)
-        if register_index == len(self._sorted_registers):
-            return None
-        register = self._sorted_registers[register_index]
-        if register.address <= address and register.address + register.address_width > address:
-            return register
+        if self._lookup_table is not None:
+            if address >= self._address_max:
+                return None
+            register_index = self._lookup_table[address]
+        else:
+            register_index = bisect.bisect_right(self._register_ends, address)
+            if register_index == len(self._sorted_registers):
+                return None
+        if self._register_starts[register_index] <= address:
+            return self._sorted_registers[register_index]
         else:
             return None
 
     def registers_intersecting(self, address: slice) -> List[Register]:
-        # Get the first register with `register.address + register.address_width` > given `address.start`. Precisely registers at >= this index will intersect with [address.start, inf) since:
-        #   * This index itself has `address.start` < `register.address + register.address_width`, implying intersection with [address.start, inf)
-        #   * Anything higher has a start address >= than this register's end address, meaning the start address > the given `address.start`, which implies intersection with [address.start, inf)
-        #   * Anything lower would have `register.address + register.address_width` <= `address.start`, preventing intersection with [address.start, inf)
-        left_index = self._register_binary_search_reg_end_right(address.start)
-        # Get the first register with `register.address` >= `address.stop`. Precisely registers at < this index will intersect with [0, address.stop) since:
-        #   * This index and higher satisefy `register.address` >= `address.stop`, which prevents intersection with [0, address.stop)
-        #   * Anything lower has `register.address` < `address.stop`, which implies intersection with [0, address.stop)
-        right_index = self._register_binary_search_left(address.stop)
-        # Since [address.start, address.stop) is the intersection of [address.start, inf) and [0, address.stop), the registers that intersect with both of these are
-        # precisely the registers that intersect with [address.start, address.stop)
+        left_index, right_index = self._register_index_range(address.start, address.stop)
+        return self._sorted_registers[left_index:right_index]
+
+    def state_slice(self, register: Register) -> slice:
+        """
+        Locates a register's raw data within the state exported by :py:meth:`RegisterMap.state_buffers`\\ . Only the
+        pages holding registers are stored, so in register maps with gaps of a page or more, this differs from the
+        register's address scaled by the address width.
+
+        :returns: The slice of the state's bytes holding the register's raw data.
+        """
+
+        compact_start, compact_stop, _ = self._compiled_registers[register]
+        return slice(compact_start * self.address_byte_width, compact_stop * self.address_byte_width)
+
+    def _register_index_range(self, start: int, stop: int) -> Tuple[int, int]:
+        # Returns the `[left, right)` range of indices into `_sorted_registers` of the registers intersecting `[start, stop)`.
+        #
+        # `left_index` is the first register with `register.address + register.address_width` > given `start`. Precisely registers at >= this index will intersect with [start, inf) since:
+        #   * This index itself has `start` < `register.address + register.address_width`, implying intersection with [start, inf)
+        #   * Anything higher has a start address >= than this register's end address, meaning the start address > the given `start`, which implies intersection with [start, inf)
+        #   * Anything lower would have `register.address + register.address_width` <= `start`, preventing intersection with [start, inf)
+        # `right_index` is the first register with `register.address` >= `stop`. Precisely registers at < this index will intersect with [0, stop) since:
+        #   * This index and higher satisefy `register.address` >= `stop`, which prevents intersection with [0, stop)
+        #   * Anything lower has `register.address` < `stop`, which implies intersection with [0, stop)
+        lookup_table = self._lookup_table
+        if lookup_table is not None:
+            register_count = len(self._sorted_registers)
+            left_index = lookup_table[start] if start < self._address_max else register_count
+            if stop < self._address_max:
+                # The first register ending after `stop` is the only one that may start before `stop` without ending
+                # before it
+                right_index = lookup_table[stop]
+                if self._register_starts[right_index] < stop:
+                    right_index += 1
+            else:
+                right_index = register_count
+        else:
+            left_index = bisect.bisect_right(self._register_ends, start)
+            right_index = bisect.bisect_left(self._register_starts, stop)
+        # Since [start, stop) is the intersection of [start, inf) and [0, stop), the registers that intersect with both of these are
+        # precisely the registers that intersect with [start, stop)
         if left_index < right_index:
-            return self._sorted_registers[left_index:right_index]
+            return left_index, right_index
         else:
-            return []
-
-    def _register_binary_search_left(self, address: int) -> int:
-        # Find the first register with `register.address` >= given `address`
-        left = 0
-        right = len(self._sorted_registers)
-        while left < right:
-            mid = (left + right) // 2
-            if self._sorted_registers[mid].address < address:
-                left = mid + 1
-            else:
-                right = mid
-        return left
-
-    def _register_binary_search_reg_end_right(self, address: int) -> int:
-        # Find the first register with `register.address + register.address_width` > given `address`
-        left = 0
-        right = len(self._sorted_registers)
-        while left < right:
-            mid = (left + right) // 2
-            if self._sorted_registers[mid].address + self._sorted_registers[mid].address_width > address:
-                right = mid
-            else:
-                left = mid + 1
-        return right
+            return left_index, left_index
+
+    def _compact_ranges(self, start: int, stop: int) -> Iterator[Tuple[int, int, int]]:
+        # Yields each `[compact_start, compact_stop)` range of the internal state backing addresses `[start, stop)`, along
+        # with the number of addresses skipped from `start` to reach it. Addresses outside of every segment are dropped.
+        if self._dense:
+            stop = min(stop, self._address_max)
+            if start < stop:
+                yield start, stop, 0
+            return
+
+        segment_starts = self._segment_starts
+        segment_stops = self._segment_stops
+        index = max(bisect.bisect_right(segment_starts, start) - 1, 0)
+        while index < len(segment_starts) and segment_starts[index] < stop:
+            segment_start = max(start, segment_starts[index])
+            segment_stop = min(stop, segment_stops[index])
+            if segment_start < segment_stop:
+                compact_start = self._segment_bases[index] + segment_start - segment_starts[index]
+                yield compact_start, compact_start + segment_stop - segment_start, segment_start - start
+            index += 1
 
     def __repr__(self):
         s = f"class {self.__name__}(RegisterMap):\n"
@@ -226,25 +730,98 @@ class RegisterMap(metaclass=RegisterMapMeta):
     Allows decoding reads and writes to a device that models its exposed state as a set of addressable registers.
 
     :cvar address_byte_width: The width of each address in the register map in bytes. Defaults to 1 byte.
+    :cvar lookup_strategy: How to look up registers by address. By default, this is chosen from the density of the
+        registers; see :py:attr:`RegisterMapMeta.active_lookup_strategy`\\ .
+    :param track_changes: When set, keep track of the generation at which each register last changed, so that
+        :py:meth:`changed_since` can report what changed.
+    :param cache_values: Whether to remember deserialized values until a transaction observes their register again.
+        Useful for registers with an expensive ``value_parser``\\ .
+    :param cache_size: When caching values, the maximum number of values to keep, evicting the least recently used.
+        Unbounded by default.
+    :param history: A :py:class:`~.TransactionHistory` to record every observed transaction in, allowing the value of
+        registers at past times to be queried.
+    :param instrumentation: An :py:class:`~.Instrumentation` to count how the register map is used.
+    :param change_feed: A :py:class:`~.ChangeFeed` to deliver changes to registers to asyncio consumers.
     """
 
     address_byte_width: int = 1
-    _address_max: int
-    # The observed state of the register map
+    lookup_strategy: Optional[LookupStrategy] = None
+    # The observed state of the register map, indexed by compact address (see `RegisterMapMeta`)
     _internal_state: bytearray
-    # The addresses which have been observed.
+    # A bitset of the compact addresses which have been observed.
     # The data at other addresses in `_internal_state` is not valid.
-    _internal_state_mask: List[bool]
+    _internal_state_mask: bytearray
+    _change_tracking: Optional[ChangeTracking]
+    # The number of transactions observed while tracking changes
+    _generation: int
+    # The generation each register last changed at, ordered from least to most recently changed
+    _register_generations: Dict[Register, int]
+    # Deserialized values of registers that haven't been observed since, or None when not caching values. Ordered from
+    # least to most recently used when the cache is bounded by `_value_cache_size`
+    _value_cache: Optional[Dict[Register, Any]]
+    _value_cache_size: Optional[int]
+    _value_cache_hits: int
+    _value_cache_misses: int
+    _history: Optional[TransactionHistory]
+    _instrumentation: Optional[Instrumentation]
+    _change_feed: Optional[ChangeFeed]
+    # When the state buffers are shared copy-on-write with clones, a one element list counting the register maps
+    # sharing them, otherwise None
+    _state_sharers: Optional[List[int]]
+
+    def __init__(
+        self,
+        *,
+        track_changes: Optional[ChangeTracking] = None,
+        cache_values: bool = False,
+        cache_size: Optional[int] = None,
+        history: Optional[TransactionHistory] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        change_feed: Optional[ChangeFeed] = None,
+    ):
+        if cache_size is not None:
+            if not cache_values:
+                raise ValueError("cache_size is only allowed when cache_values=True")
+            if cache_size < 1:
+                raise ValueError("cache_size must be at least 1")
+
+        self._internal_state = bytearray(self._compact_size * self.address_byte_width)
+        self._internal_state_mask = bytearray((self._compact_size + 7) // 8)
+        self._change_tracking = track_changes
+        self._generation = 0
+        self._register_generations = {}
+        self._value_cache = None
+        if cache_values:
+            self._value_cache = OrderedDict() if cache_size is not None else {}
+        self._value_cache_size = cache_size
+        self._value_cache_hits = 0
+        self._value_cache_misses = 0
+        self._history = history
+        if history is not None:
+            history._attach(self.__class__)
+        self._state_sharers = None
+        self._instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation._attach(self)
+        self._change_feed = change_feed
+        if change_feed is not None:
+            change_feed._attach(self)
+
+    @property
+    def generation(self) -> int:
+        """
+        The number of transactions observed so far while tracking changes. Each observed transaction starts a new
+        generation.
+        """
 
-    def __init__(self):
-        self._address_max = max((reg.address + reg.address_width for reg in self.__class__), default=0)
-        self._internal_state = bytearray(self._address_max * self.address_byte_width)
-        self._internal_state_mask = [False for _ in range(self._address_max)]
+        return self._generation
 
-    def observe(self, address: int, data: bytes) -> List[Register]:
+    def observe(self, address: int, data: bytes, timestamp: Optional[float] = None) -> List[Register]:
         """
         Updates the internal model with observed data.
 
+        :param timestamp: When the data was observed, which is recorded in the register map's history if it has one.
+            Timestamps must not decrease from one transaction to the next.
         :returns: A list of registers observed by this operation.
         """
 
@@ -258,26 +835,556 @@ class RegisterMap(metaclass=RegisterMapMeta):
         if address >= self._address_max:
             return
 
-        start_bytes = address * self.address_byte_width
-        # Clamp bytes to the end of the internal state we understand
-        end_bytes = min(end_address, self._address_max) * self.address_byte_width
-        self._internal_state[start_bytes:end_bytes] = data[: end_bytes - start_bytes]
-        for i in range(address, end_address):
-            self._internal_state_mask[i] = True
+        left_index, right_index = self._apply(address, end_address, data, timestamp)
 
         # Find the affected registers
-        return self.__class__.registers_intersecting(slice(address, end_address))
+        return self._sorted_registers[left_index:right_index]
+
+    def _apply(self, address: int, end_address: int, data: bytes, timestamp: Optional[float] = None) -> Tuple[int, int]:
+        # Applies a validated, in range transaction to the internal model, returning the `[left, right)` range of indices
+        # of the registers it observed
+        left_index, right_index = self.__class__._register_index_range(address, end_address)
+        if self._history is not None:
+            # Recording first lets the history reject the timestamp before anything changes
+            self._history._record(timestamp, address, data, self._sorted_registers[left_index:right_index])
+        if self._value_cache is not None:
+            for register in self._sorted_registers[left_index:right_index]:
+                self._value_cache.pop(register, None)
+        if self._change_tracking is None:
+            self._store(address, end_address, data)
+            return left_index, right_index
+
+        registers = self._sorted_registers[left_index:right_index]
+        if self._change_tracking is ChangeTracking.VALUES:
+            previous_values = [self._raw_value(register) for register in registers]
+            self._store(address, end_address, data)
+            registers = [
+                register
+                for register, previous_value in zip(registers, previous_values)
+                if self._raw_value(register) != previous_value
+            ]
+        else:
+            self._store(address, end_address, data)
+
+        self._generation += 1
+        register_generations = self._register_generations
+        for register in registers:
+            # Keep `_register_generations` ordered by generation, so that `changed_since` only visits recent changes
+            register_generations.pop(register, None)
+            register_generations[register] = self._generation
+        return left_index, right_index
+
+    def _store(self, address: int, end_address: int, data: bytes):
+        # Copies the observed `data` for addresses `[address, end_address)` into the segments backing them, dropping any
+        # data outside of a segment
+        if self._state_sharers is not None:
+            self._unshare_state()
+        _store_segments(self.__class__, self._internal_state, self._internal_state_mask, address, end_address, data)
+
+    def _raw_value(self, register: Register) -> Optional[bytes]:
+        # The raw data of a register, or None if it hasn't been fully observed
+        compact_start, compact_stop, _ = self._compiled_registers[register]
+        if not _bitset_all(self._internal_state_mask, compact_start, compact_stop):
+            return None
+        return bytes(
+            self._internal_state[compact_start * self.address_byte_width : compact_stop * self.address_byte_width]
+        )
+
+    def observe_many(
+        self,
+        transactions: Union[Iterable[Tuple[int, bytes]], Sequence[int], Any],
+        data: Optional[bytes] = None,
+        offsets: Optional[Sequence[int]] = None,
+        *,
+        timestamps: Optional[Sequence[float]] = None,
+        per_transaction: bool = False,
+    ) -> Union[List[Register], Tuple[array, array]]:
+        """
+        Updates the internal model with a batch of observed transactions. The resulting state is identical to calling
+        :py:meth:`observe` on each transaction in order. Unless the register map records a history, tracks changes,
+        caches values or has instrumentation or a change feed, which each need to see every transaction, the batch is
+        applied as a whole: the observed data is copied in order, but the observed addresses are marked and the observed
+        registers found once per run of addresses the batch covers rather than once per transaction.
+
+        Transactions may be given as any of:
+
+        * An iterable of ``(address, data)`` pairs.
+        * A NumPy structured array with an integer ``address`` field and a fixed-width ``data`` field (e.g. ``"S4"`` or ``("u1", 4)``).
+        * A sequence of addresses, with all of their data concatenated into ``data`` and ``offsets`` holding the
+          ``len(addresses) + 1`` offsets delimiting each transaction's data within it.
+
+        All transactions are validated before any are applied, so an invalid batch leaves the internal model untouched.
+
+        :param timestamps: When each transaction was observed, as for :py:meth:`observe`\\ .
+        :param per_transaction: Whether to report the registers observed by each transaction rather than by the whole batch.
+        :returns: By default, a list of the distinct registers observed by the batch, sorted by address. With
+            ``per_transaction=True``, a tuple ``(register_indices, transaction_offsets)`` of arrays, where the registers
+            observed by transaction ``i`` are ``register_indices[transaction_offsets[i]:transaction_offsets[i + 1]]``, as
+            indices into the register map's registers in address order.
+        """
+
+        addresses, buffer, offsets = _flatten_transactions(transactions, data, offsets)
+        address_byte_width = self.address_byte_width
+        for i in range(len(addresses)):
+            length = offsets[i + 1] - offsets[i]
+            if length < 1:
+                raise ValueError("data must be non-empty")
+            if length % address_byte_width != 0:
+                raise ValueError("data's length must be divisible by the address width")
+        if timestamps is None:
+            timestamps = itertools.repeat(None)
+        else:
+            if len(timestamps) != len(addresses):
+                raise ValueError("there must be one timestamp per transaction")
+            if self._history is not None:
+                self._history._check_timestamps(timestamps)
+
+        buffer = memoryview(buffer).cast("B")
+        if (
+            self._history is None
+            and self._change_tracking is None
+            and self._value_cache is None
+            and "_apply" not in self.__dict__
+        ):
+            # Nothing needs to see each transaction as it's applied, so the whole batch can be applied at once
+            return self._observe_batch(addresses, buffer, offsets, per_transaction)
+
+        cls = self.__class__
+        address_max = self._address_max
+        apply = self._apply
+
+        if per_transaction:
+            register_indices = array("q")
+            transaction_offsets = array("q", [0])
+        else:
+            # One flag per register, set when any transaction observes it
+            observed = bytearray(len(cls._sorted_registers))
+
+        for address, start_offset, end_offset, timestamp in zip(addresses, offsets, offsets[1:], timestamps):
+            end_address = address + (end_offset - start_offset) // address_byte_width
+            # Ignore out of range reads/writes, just as `observe` does
+            if address < address_max:
+                left_index, right_index = apply(address, end_address, buffer[start_offset:end_offset], timestamp)
+            else:
+                left_index = right_index = 0
+
+            if per_transaction:
+                register_indices.extend(range(left_index, right_index))
+                transaction_offsets.append(len(register_indices))
+            elif left_index < right_index:
+                observed[left_index:right_index] = b"\x01" * (right_index - left_index)
+
+        if per_transaction:
+            return register_indices, transaction_offsets
+        else:
+            return list(itertools.compress(cls._sorted_registers, observed))
+
+    def _observe_batch(
+        self, addresses: Sequence[int], buffer: memoryview, offsets: Sequence[int], per_transaction: bool
+    ) -> Union[List[Register], Tuple[array, array]]:
+        # Applies a validated batch of transactions to the internal model when nothing hooks into `_apply`. The data is
+        # still copied in order, so that later transactions overwrite earlier ones, but the mask is set and the observed
+        # registers are found once per merged run of addresses instead of once per transaction.
+        cls = self.__class__
+        address_byte_width = self.address_byte_width
+        address_max = cls._address_max
+        if self._state_sharers is not None:
+            self._unshare_state()
+        state = self._internal_state
+        mask = self._internal_state_mask
+
+        end_addresses = [
+            address + (end_offset - start_offset) // address_byte_width
+            for address, start_offset, end_offset in zip(addresses, offsets, offsets[1:])
+        ]
+        # Ignore out of range reads/writes, just as `observe` does
+        if cls._dense:
+            for address, end_address, offset in zip(addresses, end_addresses, offsets):
+                if address < address_max:
+                    stop = min(end_address, address_max)
+                    state[address * address_byte_width : stop * address_byte_width] = buffer[
+                        offset : offset + (stop - address) * address_byte_width
+                    ]
+        else:
+            for address, end_address, offset in zip(addresses, end_addresses, offsets):
+                if address < address_max:
+                    _store_segments(cls, state, None, address, end_address, buffer[offset:])
+
+        # Merge the transactions' address ranges into disjoint runs, in address order
+        run_starts = []
+        run_stops = []
+        for address, end_address in sorted(set(zip(addresses, end_addresses))):
+            if address >= address_max:
+                break
+            if run_stops and address <= run_stops[-1]:
+                run_stops[-1] = max(run_stops[-1], end_address)
+            else:
+                run_starts.append(address)
+                run_stops.append(end_address)
+        for run_start, run_stop in zip(run_starts, run_stops):
+            for compact_start, compact_stop, _ in cls._compact_ranges(run_start, run_stop):
+                _bitset_set(mask, compact_start, compact_stop)
+
+        if per_transaction:
+            # Out of range transactions start after every register, so observe none
+            left_indices = map(functools.partial(bisect.bisect_right, cls._register_ends), addresses)
+            right_indices = map(functools.partial(bisect.bisect_left, cls._register_starts), end_addresses)
+            index_ranges = list(map(range, left_indices, right_indices))
+            register_indices = array("q", itertools.chain.from_iterable(index_ranges))
+            transaction_offsets = array("q", itertools.accumulate(map(len, index_ranges), initial=0))
+            return register_indices, transaction_offsets
+
+        # Neighbouring runs may both observe a register spanning the gap between them, so only take it once
+        registers = []
+        taken_index = 0
+        for run_start, run_stop in zip(run_starts, run_stops):
+            left_index, right_index = cls._register_index_range(run_start, run_stop)
+            registers.extend(cls._sorted_registers[max(left_index, taken_index) : right_index])
+            taken_index = max(taken_index, right_index)
+        return registers
 
     def deserialize(self, register: Register[T]) -> T:
-        if not all(self._internal_state_mask[register.address : (register.address + register.address_width)]):
+        compact_start, compact_stop, decode = self._compiled_registers[register]
+        if not _bitset_all(self._internal_state_mask, compact_start, compact_stop):
             raise RegisterNotObserved(f"register {register.name!r} has not been observed")
 
-        start_bytes = register.address * self.address_byte_width
-        end_bytes = start_bytes + register.address_width * self.address_byte_width
-        raw_data = bytes(self._internal_state[start_bytes:end_bytes])
+        if self._value_cache is not None:
+            return self._cached_decode(register, decode)
+        return decode(self._internal_state)
+
+    def _cached_decode(self, register: Register[T], decode: Callable[[bytearray], T]) -> T:
+        # Decodes an observed register, going through the value cache
+        value_cache = self._value_cache
+        try:
+            value = value_cache[register]
+        except KeyError:
+            self._value_cache_misses += 1
+        else:
+            self._value_cache_hits += 1
+            if self._value_cache_size is not None:
+                value_cache.move_to_end(register)
+            return value
+
+        value = value_cache[register] = decode(self._internal_state)
+        if self._value_cache_size is not None and len(value_cache) > self._value_cache_size:
+            value_cache.popitem(last=False)
+        return value
+
+    def value_cache_info(self) -> ValueCacheInfo:
+        """
+        Reports the effectiveness of the value cache, in the same format as :py:func:`functools.lru_cache`\\ .
+        """
+
+        if self._value_cache is None:
+            raise RuntimeError("values are only cached when the register map is created with cache_values=True")
+        return ValueCacheInfo(
+            self._value_cache_hits, self._value_cache_misses, self._value_cache_size, len(self._value_cache)
+        )
+
+    def deserialize_fields(self, register: Register[int]) -> Dict[str, Any]:
+        """
+        Deserializes a register, then extracts each of its fields from its value.
+
+        :returns: The value of each of the register's fields, by name.
+        """
+
+        if register._extract_fields is None:
+            raise ValueError(f"register {register.name!r} has no fields")
+        return register._extract_fields(self.deserialize(register))
+
+    def changed_since(self, generation: int) -> List[Register]:
+        """
+        Finds the registers that changed after a given generation. This only visits registers that changed since
+        then, so its cost is proportional to the amount of change rather than to the size of the register map.
+
+        :param generation: A generation previously read from :py:attr:`generation`\\ .
+        :returns: A list of the registers changed by transactions after that generation, sorted by address.
+        """
+
+        if self._change_tracking is None:
+            raise RuntimeError("changes are only tracked when the register map is created with track_changes")
+        changed = []
+        for register, register_generation in reversed(self._register_generations.items()):
+            if register_generation <= generation:
+                break
+            changed.append(register)
+        changed.sort(key=lambda register: register.address)
+        return changed
+
+    def last_changed(self, register: Register) -> Optional[int]:
+        """
+        :returns: The generation at which a register last changed, or None if it hasn't changed while tracking changes.
+        """
+
+        if self._change_tracking is None:
+            raise RuntimeError("changes are only tracked when the register map is created with track_changes")
+        return self._register_generations.get(register)
+
+    def deserialize_all(self) -> Dict[Register, Any]:
+        """
+        Deserializes every register that has been fully observed.
 
-        return register.deserialize(raw_data)
+        :returns: The value of each observed register, in address order.
+        """
+
+        internal_state = self._internal_state
+        internal_state_mask = self._internal_state_mask
+        if self._value_cache is not None:
+            return {
+                register: self._cached_decode(register, decode)
+                for register, (compact_start, compact_stop, decode) in self._compiled_registers.items()
+                if _bitset_all(internal_state_mask, compact_start, compact_stop)
+            }
+        return {
+            register: decode(internal_state)
+            for register, (compact_start, compact_stop, decode) in self._compiled_registers.items()
+            if _bitset_all(internal_state_mask, compact_start, compact_stop)
+        }
+
+    def snapshot(self) -> RegisterMapSnapshot:
+        """
+        Captures the observed state, so that it can be returned to with :py:meth:`restore`\\ . This copies the state into
+        immutable buffers, without decoding any registers.
+        """
+
+        return RegisterMapSnapshot(self.__class__, bytes(self._internal_state), bytes(self._internal_state_mask))
+
+    def restore(self, snapshot: RegisterMapSnapshot):
+        """
+        Returns the observed state to a snapshot taken by :py:meth:`snapshot`\\ , from this or another instance of the
+        same register map. When tracking changes, restoring starts a new generation, in which every register whose raw
+        data differs from before changed.
+        """
+
+        if snapshot.register_map is not self.__class__:
+            raise ValueError("the snapshot was taken from a different register map")
+        if self._history is not None:
+            raise RuntimeError("a register map recording a history can't be restored, as its history can't be rewound")
+
+        if self._change_tracking is not None:
+            previous_values = {register: self._raw_value(register) for register in self._compiled_registers}
+        if self._state_sharers is not None:
+            self._unshare_state()
+        self._internal_state[:] = snapshot.state
+        self._internal_state_mask[:] = snapshot.mask
+        if self._value_cache is not None:
+            self._value_cache.clear()
+
+        if self._change_tracking is not None:
+            self._generation += 1
+            for register, previous_value in previous_values.items():
+                if self._raw_value(register) != previous_value:
+                    self._register_generations.pop(register, None)
+                    self._register_generations[register] = self._generation
+
+    def clone(self) -> RegisterMap:
+        """
+        Creates an independent copy of this register map, with the same options, observed state, tracked changes and
+        cached values. The state is shared copy-on-write, so cloning takes constant time, and the state is only copied
+        when the clone or the original first observes a transaction.
+
+        The clone doesn't record a history, have instrumentation or feed changes, since those each follow a single
+        register map.
+        """
+
+        clone = object.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone._register_generations = dict(self._register_generations)
+        if self._value_cache is not None:
+            clone._value_cache = self._value_cache.copy()
+        clone._history = None
+        if self._instrumentation is not None:
+            self._instrumentation._remove(clone)
+        if self._change_feed is not None:
+            self._change_feed._remove(clone)
+        if self._state_sharers is None:
+            self._state_sharers = [1]
+        self._state_sharers[0] += 1
+        clone._state_sharers = self._state_sharers
+        return clone
+
+    def state_buffers(self) -> Tuple[memoryview, memoryview]:
+        """
+        Exports the raw observed state without copying it, for handing to other tools.
+
+        The state holds the data of each address, ``address_byte_width`` bytes each, but only stores the pages holding
+        registers; :py:meth:`RegisterMapMeta.state_slice` locates each register's data within it. The mask is a bitset,
+        least significant bit first, of the addresses in the state which have been observed.
+
+        Both views are read-only and follow later observations, except that a register map sharing its state with a clone
+        moves to a copy of the state when it next writes to it.
+
+        :returns: A tuple ``(state, mask)`` of read-only memoryviews.
+        """
+
+        return memoryview(self._internal_state).toreadonly(), memoryview(self._internal_state_mask).toreadonly()
+
+    def _unshare_state(self):
+        # Takes a private copy of state buffers shared with clones before writing to them, unless every other register
+        # map sharing them already has
+        sharers = self._state_sharers
+        self._state_sharers = None
+        sharers[0] -= 1
+        if sharers[0]:
+            self._internal_state = bytearray(self._internal_state)
+            self._internal_state_mask = bytearray(self._internal_state_mask)
 
 
 class RegisterNotObserved(Exception):
     pass
+
+
+class RegisterMapSnapshot(NamedTuple):
+    """
+    The observed state of a register map, taken by :py:meth:`RegisterMap.snapshot`\\ .
+
+    :ivar register_map: The :py:class:`~.RegisterMap` subclass the snapshot was taken from.
+    :ivar state: The observed data, in the same layout as :py:meth:`RegisterMap.state_buffers`\\ .
+    :ivar mask: The bitset of observed addresses.
+    """
+
+    register_map: RegisterMapMeta
+    state: bytes
+    mask: bytes
+
+
+class ValueCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+def _bitset_set(bits: bytearray, start: int, stop: int):
+    # Sets bits `[start, stop)` of a bitset stored least significant bit first
+    if start >= stop:
+        return
+    first_byte = start >> 3
+    last_byte = stop >> 3
+    first_mask = (0xFF << (start & 7)) & 0xFF
+    last_mask = (1 << (stop & 7)) - 1
+    if first_byte == last_byte:
+        bits[first_byte] |= first_mask & last_mask
+        return
+    bits[first_byte] |= first_mask
+    if last_byte > first_byte + 1:
+        bits[first_byte + 1 : last_byte] = b"\xff" * (last_byte - first_byte - 1)
+    if last_mask:
+        bits[last_byte] |= last_mask
+
+
+def _bitset_all(bits: bytearray, start: int, stop: int) -> bool:
+    # Checks whether bits `[start, stop)` of a bitset stored least significant bit first are all set
+    if start >= stop:
+        return True
+    first_byte = start >> 3
+    last_byte = stop >> 3
+    first_mask = (0xFF << (start & 7)) & 0xFF
+    last_mask = (1 << (stop & 7)) - 1
+    if first_byte == last_byte:
+        return bits[first_byte] & first_mask & last_mask == first_mask & last_mask
+    if bits[first_byte] & first_mask != first_mask:
+        return False
+    if last_mask and bits[last_byte] & last_mask != last_mask:
+        return False
+    return bits.count(0xFF, first_byte + 1, last_byte) == last_byte - first_byte - 1
+
+
+# Matches the first byte of a bitset with any bit set, or with any bit clear
+_BITSET_ANY_SET = re.compile(b"[^\\x00]")
+_BITSET_ANY_CLEAR = re.compile(b"[^\\xff]")
+
+
+def _bitset_runs(bits: bytearray) -> Iterator[Tuple[int, int]]:
+    # Yields the `[start, stop)` ranges of consecutive set bits of a bitset stored least significant bit first
+    end = len(bits) * 8
+    position = _bitset_find(bits, 0, 1, _BITSET_ANY_SET)
+    while position < end:
+        stop = _bitset_find(bits, position, 0, _BITSET_ANY_CLEAR)
+        yield position, stop
+        position = _bitset_find(bits, stop, 1, _BITSET_ANY_SET)
+
+
+def _bitset_find(bits: bytearray, position: int, value: int, pattern: re.Pattern) -> int:
+    # The first bit at or after `position` equal to `value`, or the end of the bitset if there isn't one. Whole bytes
+    # without such a bit are skipped over with `pattern`.
+    end = len(bits) * 8
+    while position < end:
+        if not position & 7:
+            match = pattern.search(bits, position >> 3)
+            if match is None:
+                return end
+            position = match.start() * 8
+        if bits[position >> 3] >> (position & 7) & 1 == value:
+            return position
+        position += 1
+    return end
+
+
+def _store_segments(
+    register_map: RegisterMapMeta,
+    state: bytearray,
+    mask: Optional[bytearray],
+    address: int,
+    end_address: int,
+    data: bytes,
+    state_base: int = 0,
+    mask_base: int = 0,
+):
+    # Copies `data` for addresses `[address, end_address)` into a state buffer laid out like `register_map`'s internal
+    # state from byte `state_base` onwards, marking them observed in the bitset `mask` from bit `mask_base` onwards unless
+    # it's None. Data outside of every segment is dropped.
+    address_byte_width = register_map.address_byte_width
+    if register_map._dense:
+        # Addresses and compact addresses coincide, so only clamp the data to the end of the internal state
+        stop = min(end_address, register_map._address_max)
+        state[state_base + address * address_byte_width : state_base + stop * address_byte_width] = data[
+            : (stop - address) * address_byte_width
+        ]
+        if mask is not None:
+            _bitset_set(mask, mask_base + address, mask_base + stop)
+        return
+
+    for compact_start, compact_stop, skipped in register_map._compact_ranges(address, end_address):
+        state[state_base + compact_start * address_byte_width : state_base + compact_stop * address_byte_width] = data[
+            skipped * address_byte_width : (skipped + compact_stop - compact_start) * address_byte_width
+        ]
+        if mask is not None:
+            _bitset_set(mask, mask_base + compact_start, mask_base + compact_stop)
+
+
+def _flatten_transactions(
+    transactions: Any, data: Optional[bytes], offsets: Optional[Sequence[int]]
+) -> Tuple[Sequence[int], bytes, Sequence[int]]:
+    # Normalizes the transaction formats accepted by `RegisterMap.observe_many` into a sequence of addresses, one buffer
+    # holding all of their data, and the `len(addresses) + 1` offsets delimiting each transaction's data in that buffer
+    if data is not None or offsets is not None:
+        if data is None or offsets is None:
+            raise ValueError("data and offsets must be given together")
+        addresses = transactions
+        if len(offsets) != len(addresses) + 1:
+            raise ValueError("offsets must have one more entry than there are transactions")
+        # NumPy arrays are iterated and bisected into one element at a time, which is much faster with Python integers
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+        if hasattr(offsets, "tolist"):
+            offsets = offsets.tolist()
+        return addresses, data, offsets
+
+    dtype = getattr(transactions, "dtype", None)
+    if dtype is not None and dtype.names is not None:
+        # NumPy structured array: every transaction has the same data width, so the data field is already one flat buffer
+        if "address" not in dtype.names or "data" not in dtype.names:
+            raise ValueError("structured transaction arrays must have 'address' and 'data' fields")
+        width = dtype["data"].itemsize
+        addresses = transactions["address"].tolist()
+        return addresses, transactions["data"].tobytes(), range(0, (len(addresses) + 1) * width, width)
+
+    addresses = []
+    chunks = []
+    offsets = [0]
+    for address, chunk in transactions:
+        addresses.append(address)
+        chunks.append(chunk)
+        offsets.append(offsets[-1] + len(chunk))
+    return addresses, b"".join(chunks), offsets
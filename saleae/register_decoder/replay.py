@@ -0,0 +1,203 @@
+"""
+Parallel replay of large captures across processes.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, List, Tuple, Sequence, Callable, NamedTuple, Any
+
+from .register_map import (
+    RegisterMap,
+    RegisterMapMeta,
+    RegisterMapSnapshot,
+    _flatten_transactions,
+    _bitset_runs,
+    _bitset_set,
+)
+
+# A chunk of transactions, as its addresses, one buffer of all of their data, and the offsets delimiting each
+# transaction's data in that buffer
+_Chunk = Tuple[Sequence[int], bytes, Sequence[int]]
+
+# Called in a worker with a register map holding the state at the start of a chunk, and the chunk's addresses, data,
+# offsets and the index of its first transaction in the whole capture
+EmitFunction = Callable[[RegisterMap, Sequence[int], bytes, Sequence[int], int], Any]
+
+
+class ReplayResult(NamedTuple):
+    """
+    The outcome of :py:func:`replay_capture`\\ .
+
+    :ivar register_map: A register map holding the state after the whole capture.
+    :ivar results: What ``emit`` returned for each chunk, in capture order, or an empty list without ``emit``\\ .
+    """
+
+    register_map: RegisterMap
+    results: List[Any]
+
+
+def replay_capture(
+    register_map: RegisterMapMeta,
+    transactions: Any,
+    data: Optional[bytes] = None,
+    offsets: Optional[Sequence[int]] = None,
+    *,
+    initial: Optional[RegisterMap] = None,
+    emit: Optional[EmitFunction] = None,
+    chunk_size: int = 65536,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+) -> ReplayResult:
+    """
+    Replays a capture using several processes. This gives exactly the same state as observing every transaction in
+    order with one register map, but spreads the work over the available cores.
+
+    The capture is split into chunks of ``chunk_size`` transactions, and replayed in three steps:
+
+    1. Each chunk is observed by a fresh register map in a worker, giving the data it wrote and which addresses it
+       covered.
+    2. Those partial states are merged in order, which is cheap compared to observing the transactions, giving the
+       exact state at the start of each chunk.
+    3. If ``emit`` is given, each chunk is observed again in a worker, starting from its start state, and ``emit``
+       produces a result for it, such as the changes found by :py:func:`decoded_changes`\\ .
+
+    Register maps and ``emit`` are sent to worker processes by reference, so they must be defined at the top level of a
+    module. Register maps created at runtime, such as by the loaders, can be replayed by passing a
+    :py:class:`~concurrent.futures.ThreadPoolExecutor` as the ``executor``\\ , at the cost of parallelism.
+
+    :param register_map: The :py:class:`~.RegisterMap` subclass describing the device.
+    :param transactions: The capture's transactions, in any of the forms accepted by
+        :py:meth:`RegisterMap.observe_many`\\ , along with ``data`` and ``offsets``\\ .
+    :param initial: The register map's state before the capture. Defaults to nothing having been observed.
+    :param emit: A function to produce a result for each chunk. It's called with a register map holding the state at
+        the start of the chunk, which it should observe the chunk's transactions with, followed by the chunk's
+        addresses, data and offsets in the same form as :py:meth:`RegisterMap.observe_many` takes, and the index of the
+        chunk's first transaction within the capture. Its result must be picklable.
+    :param chunk_size: The number of transactions in each chunk.
+    :param executor: The executor to run chunks in. Defaults to a new :py:class:`~concurrent.futures.ProcessPoolExecutor`
+        with ``max_workers`` workers, unless the capture fits in a single chunk, in which case it's replayed directly.
+    :returns: The state after the capture, and the result of ``emit`` for each chunk.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if initial is not None and initial.__class__ is not register_map:
+        raise ValueError("initial must be an instance of register_map")
+
+    addresses, buffer, offsets = _flatten_transactions(transactions, data, offsets)
+    chunks = [
+        _slice_chunk(addresses, buffer, offsets, start, min(start + chunk_size, len(addresses)))
+        for start in range(0, len(addresses), chunk_size)
+    ]
+
+    if executor is None and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return _replay_chunks(register_map, chunks, chunk_size, initial, emit, executor)
+    return _replay_chunks(register_map, chunks, chunk_size, initial, emit, executor)
+
+
+def decoded_changes(
+    register_map: RegisterMap, addresses: Sequence[int], data: bytes, offsets: Sequence[int], first_index: int
+) -> List[Tuple[int, str, Any]]:
+    """
+    An ``emit`` function for :py:func:`replay_capture` which finds every change to the value of a register. A register changes
+    when a transaction completes its observation, or leaves it with different raw data than before.
+
+    :returns: A list of ``(transaction_index, register_name, value)`` tuples, in the order the changes happened.
+    """
+
+    cls = register_map.__class__
+    address_byte_width = cls.address_byte_width
+    changes = []
+    for index, (address, start_offset, end_offset) in enumerate(zip(addresses, offsets, offsets[1:])):
+        registers = cls.registers_intersecting(
+            slice(address, address + (end_offset - start_offset) // address_byte_width)
+        )
+        previous_values = [register_map._raw_value(register) for register in registers]
+        register_map.observe(address, data[start_offset:end_offset])
+        for register, previous_value in zip(registers, previous_values):
+            raw_value = register_map._raw_value(register)
+            if raw_value is not None and raw_value != previous_value:
+                changes.append((first_index + index, register.name, register_map.deserialize(register)))
+    return changes
+
+
+def _slice_chunk(addresses: Sequence[int], buffer: bytes, offsets: Sequence[int], start: int, stop: int) -> _Chunk:
+    # The transactions `[start, stop)`, with their own copy of their data so that only it is sent to workers
+    base = offsets[start]
+    return (
+        list(addresses[start:stop]),
+        bytes(buffer[base : offsets[stop]]),
+        [offset - base for offset in offsets[start : stop + 1]],
+    )
+
+
+def _replay_chunks(
+    register_map: RegisterMapMeta,
+    chunks: List[_Chunk],
+    chunk_size: int,
+    initial: Optional[RegisterMap],
+    emit: Optional[EmitFunction],
+    executor: Optional[Executor],
+) -> ReplayResult:
+    def run(function, *args):
+        # Runs the function on every chunk, in the executor if there is one
+        if executor is None:
+            return [function(*chunk_args) for chunk_args in zip(*args)]
+        return list(executor.map(function, *args))
+
+    count = len(chunks)
+    partial_states = run(_observe_chunk, [register_map] * count, chunks)
+
+    # Merge the partial states in order, remembering the state at the start of each chunk
+    final = register_map()
+    if initial is not None:
+        final.restore(initial.snapshot())
+    start_states = []
+    for partial_state in partial_states:
+        if emit is not None:
+            start_states.append(final.snapshot())
+        _merge_state(final, partial_state)
+
+    results = []
+    if emit is not None:
+        results = run(
+            _emit_chunk,
+            [register_map] * count,
+            start_states,
+            chunks,
+            range(0, count * chunk_size, chunk_size),
+            [emit] * count,
+        )
+    return ReplayResult(final, results)
+
+
+def _observe_chunk(register_map: RegisterMapMeta, chunk: _Chunk) -> RegisterMapSnapshot:
+    # Observes a chunk from an empty state, returning the partial state, whose mask holds the addresses it covered
+    partial = register_map()
+    partial.observe_many(*chunk)
+    return partial.snapshot()
+
+
+def _emit_chunk(
+    register_map: RegisterMapMeta,
+    start_state: RegisterMapSnapshot,
+    chunk: _Chunk,
+    first_index: int,
+    emit: EmitFunction,
+) -> Any:
+    reg_map = register_map()
+    reg_map.restore(start_state)
+    return emit(reg_map, *chunk, first_index)
+
+
+def _merge_state(reg_map: RegisterMap, partial_state: RegisterMapSnapshot):
+    # Applies a later partial state on top of a register map's state, taking the addresses it covered from it
+    address_byte_width = reg_map.address_byte_width
+    state = partial_state.state
+    for start, stop in _bitset_runs(partial_state.mask):
+        reg_map._internal_state[start * address_byte_width : stop * address_byte_width] = state[
+            start * address_byte_width : stop * address_byte_width
+        ]
+        _bitset_set(reg_map._internal_state_mask, start, stop)
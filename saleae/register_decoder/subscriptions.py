@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from array import array
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Optional, Dict, List, Tuple, Iterable, NamedTuple, Any
+
+from .register_map import RegisterMap, Register
+
+
+class Overflow(Enum):
+    """
+    What a :py:class:`Subscription` does with changes that arrive faster than its consumer takes them.
+    """
+
+    #: Keep at most one pending change per register, replacing it with the latest value. When changes to more than
+    #: ``maxsize`` registers are pending, drop the oldest.
+    COALESCE = "coalesce"
+    #: Queue every change, dropping the oldest once ``maxsize`` are pending.
+    DROP_OLDEST = "drop_oldest"
+
+
+class ChangeEvent(NamedTuple):
+    """
+    A change to the value of a register.
+
+    :ivar register: The register that changed.
+    :ivar value: The register's new value.
+    :ivar timestamp: The timestamp of the transaction that changed it, if it had one.
+    """
+
+    register: Register
+    value: Any
+    timestamp: Optional[float]
+
+
+class ChangeFeed:
+    """
+    Delivers changes to the values of a :py:class:`~.RegisterMap`\\ 's registers to asyncio consumers, as transactions are
+    observed. A register changes when a transaction completes its observation, or leaves it with different raw data.
+
+    A feed is given to a single register map, by passing it as its ``change_feed``\\ . Consumers then subscribe to the
+    registers they're interested in::
+
+        feed = ChangeFeed()
+        reg_map = MyRegMap(change_feed=feed)
+        async with feed.subscribe([MyRegMap.status]) as subscription:
+            async for events in subscription:
+                ...
+
+    Each subscription queues changes independently, within a bounded amount of memory, so observing never waits for
+    consumers. Observing may happen in another thread than the consumers' event loop. Registers without subscribers
+    are observed at full speed, and register maps without a feed pay nothing.
+    """
+
+    _register_map: Optional[RegisterMap]
+    # The subscriptions to each register, and the number of subscriptions to each register in address order. The tuples
+    # of subscriptions are replaced rather than modified, so that observing in another thread sees a consistent set.
+    _subscriptions: Dict[Register, Tuple[Subscription, ...]]
+    _watched: array
+
+    def __init__(self):
+        self._register_map = None
+        self._subscriptions = {}
+        self._watched = array("I")
+
+    def subscribe(
+        self,
+        registers: Iterable[Register] = (),
+        addresses: Iterable[slice] = (),
+        *,
+        maxsize: int = 1024,
+        overflow: Overflow = Overflow.COALESCE,
+        max_batch: Optional[int] = None,
+    ) -> Subscription:
+        """
+        Subscribes to changes to some registers.
+
+        :param registers: The registers to receive changes to.
+        :param addresses: Ranges of addresses, as slices, to receive changes to every register intersecting.
+        :param maxsize: The maximum number of changes to hold while waiting for the consumer.
+        :param overflow: What to do with changes when the consumer falls behind.
+        :param max_batch: The maximum number of changes to deliver at once. Unbounded by default.
+        :returns: The subscription, to iterate over with ``async for``\\ .
+        """
+
+        if self._register_map is None:
+            raise RuntimeError("the feed must be given to a RegisterMap before subscribing")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if max_batch is not None and max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+
+        cls = self._register_map.__class__
+        subscribed = set()
+        for register in registers:
+            if register not in cls._compiled_registers:
+                raise ValueError(f"register {register.name!r} is not part of the register map")
+            subscribed.add(register)
+        for address in addresses:
+            subscribed.update(cls.registers_intersecting(address))
+
+        subscription = Subscription(self, frozenset(subscribed), maxsize, overflow, max_batch)
+        register_indices = {register: index for index, register in enumerate(cls._sorted_registers)}
+        for register in subscribed:
+            self._subscriptions[register] = self._subscriptions.get(register, ()) + (subscription,)
+            self._watched[register_indices[register]] += 1
+        return subscription
+
+    def _attach(self, register_map: RegisterMap):
+        if self._register_map is not None:
+            raise ValueError("a ChangeFeed can only follow a single register map")
+        self._register_map = register_map
+        cls = register_map.__class__
+        self._watched = array("I", [0]) * len(cls._sorted_registers)
+
+        sorted_registers = cls._sorted_registers
+        register_index_range = cls._register_index_range
+        raw_value = register_map._raw_value
+        subscriptions = self._subscriptions
+        watched = self._watched
+        apply = register_map._apply
+
+        def notifying_apply(address, end_address, data, timestamp=None):
+            left_index, right_index = register_index_range(address, end_address)
+            if not any(watched[left_index:right_index]):
+                return apply(address, end_address, data, timestamp)
+
+            registers = [
+                register
+                for register, count in zip(sorted_registers[left_index:right_index], watched[left_index:right_index])
+                if count
+            ]
+            previous_values = [raw_value(register) for register in registers]
+            result = apply(address, end_address, data, timestamp)
+            for register, previous_value in zip(registers, previous_values):
+                value = raw_value(register)
+                if value is not None and value != previous_value:
+                    for subscription in subscriptions.get(register, ()):
+                        subscription._push(register, value, timestamp)
+            return result
+
+        register_map._apply = notifying_apply
+
+    @staticmethod
+    def _remove(register_map: RegisterMap):
+        # Stops a copy of a register map with a feed from notifying it
+        register_map.__dict__.pop("_apply", None)
+        register_map._change_feed = None
+
+    def _unsubscribe(self, subscription: Subscription):
+        register_indices = {register: index for index, register in enumerate(self._register_map._sorted_registers)}
+        for register in subscription.registers:
+            remaining = tuple(other for other in self._subscriptions[register] if other is not subscription)
+            if remaining:
+                self._subscriptions[register] = remaining
+            else:
+                del self._subscriptions[register]
+            self._watched[register_indices[register]] -= 1
+
+
+class Subscription:
+    """
+    A consumer's view of a :py:class:`ChangeFeed`\\ , created by :py:meth:`ChangeFeed.subscribe`\\ . Iterating over it with
+    ``async for`` gives lists of the :py:class:`ChangeEvent`\\ s that arrived since the last, oldest first, waiting when
+    there are none. Values are only deserialized once they're delivered, so changes that are coalesced or dropped cost
+    little.
+
+    :ivar registers: The registers subscribed to.
+    :ivar dropped: The number of changes dropped because the consumer fell behind.
+    """
+
+    registers: frozenset
+    dropped: int
+
+    def __init__(
+        self, feed: ChangeFeed, registers: frozenset, maxsize: int, overflow: Overflow, max_batch: Optional[int]
+    ):
+        self.registers = registers
+        self.dropped = 0
+        self._feed = feed
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._max_batch = max_batch
+        # Pending changes, as `(register, raw data, timestamp)`, keyed by register when coalescing
+        self._pending = OrderedDict() if overflow is Overflow.COALESCE else deque()
+        # Guards the pending changes and the waiter, since observing may happen in another thread
+        self._lock = threading.Lock()
+        # Resolved when a change arrives for a consumer waiting on an empty queue
+        self._waiter: Optional[asyncio.Future] = None
+        self._closed = False
+
+    def close(self):
+        """
+        Unsubscribes. Changes already pending are still delivered, then iteration stops.
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            waiter, self._waiter = self._waiter, None
+        self._feed._unsubscribe(self)
+        if waiter is not None:
+            _wake(waiter)
+
+    def __aiter__(self) -> Subscription:
+        return self
+
+    async def __anext__(self) -> List[ChangeEvent]:
+        while True:
+            with self._lock:
+                if self._pending:
+                    changes = self._take()
+                    break
+                if self._closed:
+                    raise StopAsyncIteration
+                waiter = self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+        # Deserialize outside of the lock, so observing isn't held up
+        return [
+            ChangeEvent(register, register.deserialize(raw_data), timestamp)
+            for register, raw_data, timestamp in changes
+        ]
+
+    async def __aenter__(self) -> Subscription:
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _take(self) -> list:
+        # Removes the next batch of pending changes. Called with the lock held.
+        pending = self._pending
+        count = len(pending) if self._max_batch is None else min(len(pending), self._max_batch)
+        if self._overflow is Overflow.COALESCE:
+            return [pending.popitem(last=False)[1] for _ in range(count)]
+        return [pending.popleft() for _ in range(count)]
+
+    def _push(self, register: Register, raw_data: bytes, timestamp: Optional[float]):
+        # Queues a change without ever blocking, waking the consumer if it's waiting
+        with self._lock:
+            if self._closed:
+                return
+            pending = self._pending
+            if self._overflow is Overflow.COALESCE:
+                if register not in pending and len(pending) == self._maxsize:
+                    pending.popitem(last=False)
+                    self.dropped += 1
+                pending[register] = (register, raw_data, timestamp)
+            else:
+                if len(pending) == self._maxsize:
+                    pending.popleft()
+                    self.dropped += 1
+                pending.append((register, raw_data, timestamp))
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            _wake(waiter)
+
+
+def _wake(waiter: asyncio.Future):
+    # Resolves a waiter from any thread
+    loop = waiter.get_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        _resolve(waiter)
+    elif not loop.is_closed():
+        loop.call_soon_threadsafe(_resolve, waiter)
+
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
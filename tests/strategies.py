@@ -1,9 +1,9 @@
 import hypothesis
 from hypothesis import given, assume, strategies
-from hypothesis.strategies import integers
+from hypothesis.strategies import integers, lists, tuples, binary, booleans
 import pytest
 
-from saleae.register_decoder import RegisterMap, Register
+from saleae.register_decoder import RegisterMap, Register, LookupStrategy, ByteOrder
 
 
 @strategies.composite
@@ -12,20 +12,51 @@ def register_maps(
     register_gap=integers(min_value=0, max_value=100),
     register_width=integers(min_value=1, max_value=100),
     register_count=integers(min_value=0, max_value=10),
+    lookup_strategy=strategies.sampled_from([None, LookupStrategy.TABLE, LookupStrategy.BISECT]),
+    value_type=strategies.just(bytes),
+    byte_order=strategies.sampled_from([ByteOrder.BIG, ByteOrder.LITTLE]),
+    address_byte_width=strategies.just(1),
 ):
     current_addr = 0
     # Generate some registers prior to the targeted register
     registers = []
-    for _ in range(draw(integers(min_value=0, max_value=10))):
+    for _ in range(draw(register_count)):
         # Skip some address entries
         current_addr += draw(register_gap)
-        # Add a register
+        # Add a register, as raw bytes or as an integer of either byte order and signedness
         address_width = draw(register_width)
-        registers.append(Register(current_addr, address_width=address_width))
+        if draw(value_type) is int:
+            registers.append(
+                Register(
+                    current_addr,
+                    address_width=address_width,
+                    value_type=int,
+                    byte_order=draw(byte_order),
+                    signed=draw(booleans()),
+                )
+            )
+        else:
+            registers.append(Register(current_addr, address_width=address_width))
         current_addr += address_width
 
-    members = {}
+    members = {"lookup_strategy": draw(lookup_strategy), "address_byte_width": draw(address_byte_width)}
     for register in registers:
         members[draw(strategies.from_regex(r"[A-Za-z_]+"))] = register
 
     return RegisterMap.__class__("MyRegMap", (RegisterMap,), members)
+
+
+def transaction_data(min_words=1, max_words=64, address_byte_width=1):
+    # The data of a transaction, as a whole number of addresses' worth of bytes
+    if address_byte_width == 1:
+        return binary(min_size=min_words, max_size=max_words)
+    return integers(min_value=min_words, max_value=max_words).flatmap(
+        lambda words: binary(min_size=words * address_byte_width, max_size=words * address_byte_width)
+    )
+
+
+def transactions(max_size=20, max_address=1200, **data_options):
+    # Lists of `(address, data)` transactions, with data as drawn by `transaction_data`
+    return lists(
+        tuples(integers(min_value=0, max_value=max_address), transaction_data(**data_options)), max_size=max_size
+    )
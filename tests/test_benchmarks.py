@@ -0,0 +1,34 @@
+# Smoke tests for the benchmark suite
+from benchmarks.suite import benchmarks, run_benchmarks, compare_reports
+
+
+def test_benchmarks_run():
+    report = run_benchmarks(benchmarks(sizes=[10], operations=10), repeats=1)
+    assert {name.split("/")[0] for name in report["results"]} == {
+        "build",
+        "load_json",
+        "load_json_cached",
+        "observe",
+        "observe_many",
+        "observe_many_flat",
+        "observe_many_per_transaction",
+        "deserialize",
+        "register_containing",
+        "registers_intersecting",
+    }
+    assert all(result["seconds_per_operation"] > 0 for result in report["results"].values())
+
+
+def test_compare_reports_flags_regressions():
+    baseline = {"results": {"a": {"seconds_per_operation": 1.0}, "b": {"seconds_per_operation": 1.0}}}
+    current = {
+        "results": {
+            "a": {"seconds_per_operation": 1.05},
+            "b": {"seconds_per_operation": 1.5},
+            "c": {"seconds_per_operation": 1.0},
+        }
+    }
+    assert [(comparison.name, comparison.regressed) for comparison in compare_reports(baseline, current)] == [
+        ("a", False),
+        ("b", True),
+    ]
@@ -0,0 +1,97 @@
+# Tests decoding register accesses from bus frames
+from hypothesis import given
+from hypothesis.strategies import integers, lists, tuples, binary, booleans
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder
+from saleae.register_decoder.bus import BusAdapter, BusFrame, RegisterEvent
+
+
+class MyRegMap(RegisterMap):
+    control = Register(0x00, value_type=int, byte_order=ByteOrder.BIG, signed=False)
+    status = Register(0x01, address_width=2)
+    data = Register(0x04, address_width=4)
+
+
+def test_pointer_write_then_burst_read():
+    adapter = BusAdapter(MyRegMap())
+    events = list(
+        adapter.events(
+            [
+                BusFrame(False, b"\x00\x05", 1.0),
+                BusFrame(False, b"\x01", 2.0),
+                BusFrame(True, b"\x06\x07", 3.0),
+            ]
+        )
+    )
+    assert events == [
+        RegisterEvent(MyRegMap.control, 5, False, 1.0),
+        RegisterEvent(MyRegMap.status, b"\x06\x07", True, 3.0),
+    ]
+    assert adapter.pointer == 0x03
+
+
+def test_burst_wraps_at_end_of_map():
+    adapter = BusAdapter(MyRegMap())
+    events = list(adapter.events([BusFrame(False, b"\x06" + bytes(range(1, 6)))]))
+    assert [(event.register, event.value) for event in events] == [
+        (MyRegMap.control, 3),
+        (MyRegMap.status, b"\x04\x05"),
+    ]
+    state, _ = adapter.register_map.state_buffers()
+    assert state[MyRegMap.state_slice(MyRegMap.data)][2:] == b"\x01\x02"
+    assert adapter.pointer == 0x03
+
+
+def test_spi_pointer_in_reads():
+    class WideRegMap(RegisterMap):
+        address_byte_width = 2
+
+        control = Register(0x00)
+        status = Register(0x01)
+
+    adapter = BusAdapter(
+        WideRegMap(),
+        pointer_width=2,
+        pointer_byte_order=ByteOrder.LITTLE,
+        pointer_mask=0x7FFF,
+        pointer_in_reads=True,
+    )
+    events = list(adapter.events([BusFrame(True, b"\x00\x80\x01\x02\x03\x04\x05")]))
+    assert [(event.register, event.value) for event in events] == [
+        (WideRegMap.control, b"\x01\x02"),
+        (WideRegMap.status, b"\x03\x04"),
+    ]
+
+
+def test_without_auto_increment():
+    adapter = BusAdapter(MyRegMap(), auto_increment=False)
+    events = list(adapter.events([BusFrame(False, b"\x00\x01\x02\x03")]))
+    assert [event.value for event in events] == [1, 2, 3]
+    assert adapter.pointer == 0x00
+
+
+@given(lists(tuples(booleans(), binary(max_size=20)), max_size=20), integers(min_value=1, max_value=8))
+def test_matches_per_byte_model(frames, wrap_at):
+    adapter = BusAdapter(MyRegMap(), wrap_at=wrap_at)
+    expected = MyRegMap()
+    pointer = None
+    for read, data in frames:
+        if not read:
+            if not data:
+                continue
+            pointer, data = data[0], data[1:]
+        if pointer is None:
+            continue
+        for byte in data:
+            expected.observe(pointer, bytes([byte]))
+            pointer += 1
+            if pointer == wrap_at:
+                pointer = 0
+
+    # Feed the frames in two chunks, to check that the pointer carries over
+    events = list(adapter.events(BusFrame(read, data) for read, data in frames[: len(frames) // 2]))
+    events += adapter.events(BusFrame(read, data) for read, data in frames[len(frames) // 2 :])
+    assert adapter.register_map.deserialize_all() == expected.deserialize_all()
+    assert adapter.pointer == pointer
+    for event in events:
+        assert event.register in expected.deserialize_all()
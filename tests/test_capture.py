@@ -0,0 +1,59 @@
+# Tests that vectorized capture decoding matches observing transactions one at a time
+from hypothesis import given, strategies
+from hypothesis.strategies import integers, just
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder
+from saleae.register_decoder.capture import decode_capture
+
+from .strategies import register_maps, transactions
+
+
+@given(
+    register_maps(
+        register_gap=integers(min_value=0, max_value=3),
+        register_width=integers(min_value=1, max_value=5),
+        register_count=integers(min_value=1, max_value=5),
+        value_type=just(int),
+        address_byte_width=integers(min_value=1, max_value=3),
+    ),
+    strategies.data(),
+)
+def test_decode_capture_matches_observe(register_map_cls, data):
+    address_byte_width = register_map_cls.address_byte_width
+    captured = data.draw(transactions(max_size=30, max_address=40, max_words=8, address_byte_width=address_byte_width))
+    split = data.draw(integers(min_value=0, max_value=len(captured)))
+
+    reg_map = register_map_cls()
+    reg_map.observe_many(captured[:split])
+    decoded = decode_capture(register_map_cls, captured[split:], initial=reg_map)
+
+    expected = {register: ([], []) for register in register_map_cls}
+    for index, (address, transaction_data) in enumerate(captured[split:]):
+        for register in reg_map.observe(address, transaction_data) or []:
+            if reg_map._raw_value(register) is not None:
+                expected[register][0].append(index)
+                expected[register][1].append(reg_map.deserialize(register))
+
+    for register, (indices, values) in expected.items():
+        assert decoded[register].indices.tolist() == indices
+        assert decoded[register].values.tolist() == values
+
+
+def test_decode_capture_changes():
+    class MyRegMap(RegisterMap):
+        count = Register(0x00, address_width=2, value_type=int, byte_order=ByteOrder.BIG, signed=False)
+        status = Register(0x02, value_type=int, byte_order=ByteOrder.BIG, signed=True)
+
+    capture = np.array(
+        [(0x00, b"\x00\x01\xff"), (0x01, b"\x01\xff\x00"), (0x00, b"\x00\x02\xfe"), (0x02, b"\xfe\x00\x00")],
+        dtype=[("address", "u4"), ("data", "S3")],
+    )
+    decoded = decode_capture(MyRegMap, capture)
+    assert decoded[MyRegMap.count].values.dtype == np.uint16
+    assert decoded[MyRegMap.count].indices.tolist() == [0, 1, 2]
+    assert decoded[MyRegMap.count].changed.tolist() == [0, 2]
+    assert decoded[MyRegMap.status].values.tolist() == [-1, -1, -2, -2]
+    assert decoded[MyRegMap.status].changed.tolist() == [0, 2]
@@ -0,0 +1,70 @@
+# Tests that a `RegisterMap` tracking changes reports what changed since a generation
+from hypothesis import given
+from hypothesis.strategies import integers
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ChangeTracking
+
+from .strategies import register_maps, transactions
+
+
+class MyRegMap(RegisterMap):
+    status = Register(0x00)
+    data = Register(0x01, address_width=2)
+    control = Register(0x03)
+
+
+def test_changed_since_writes():
+    reg_map = MyRegMap(track_changes=ChangeTracking.WRITES)
+    assert reg_map.generation == 0
+
+    reg_map.observe(0x00, b"\x01\x02")
+    start = reg_map.generation
+    assert reg_map.changed_since(0) == [MyRegMap.status, MyRegMap.data]
+
+    reg_map.observe(0x03, b"\x00")
+    reg_map.observe(0x00, b"\x01")
+    assert reg_map.changed_since(start) == [MyRegMap.status, MyRegMap.control]
+    assert reg_map.changed_since(reg_map.generation) == []
+    assert reg_map.last_changed(MyRegMap.status) == reg_map.generation
+    assert reg_map.last_changed(MyRegMap.data) == start
+
+
+def test_changed_since_values():
+    reg_map = MyRegMap(track_changes=ChangeTracking.VALUES)
+
+    # A partial observation doesn't change a register, but completing it does
+    reg_map.observe(0x01, b"\x01")
+    assert reg_map.changed_since(0) == []
+    reg_map.observe(0x02, b"\x02")
+    assert reg_map.changed_since(0) == [MyRegMap.data]
+
+    start = reg_map.generation
+    reg_map.observe(0x01, b"\x01\x02\x03")
+    assert reg_map.changed_since(start) == [MyRegMap.control]
+    reg_map.observe(0x02, b"\x04")
+    assert reg_map.changed_since(start) == [MyRegMap.data, MyRegMap.control]
+
+
+def test_changed_since_requires_tracking():
+    with pytest.raises(RuntimeError):
+        MyRegMap().changed_since(0)
+
+
+@given(
+    register_maps(),
+    transactions(),
+    integers(min_value=0, max_value=20),
+)
+def test_changed_since_matches_full_scan(register_map_cls, transactions, since):
+    reg_map = register_map_cls(track_changes=ChangeTracking.VALUES)
+    snapshots = {0: {register: None for register in register_map_cls}}
+    for address, data in transactions:
+        reg_map.observe(address, data)
+        snapshots[reg_map.generation] = {register: reg_map._raw_value(register) for register in register_map_cls}
+
+    before = snapshots[min(since, reg_map.generation)]
+    changed = reg_map.changed_since(since)
+    for register in register_map_cls:
+        if before[register] != reg_map._raw_value(register):
+            assert register in changed
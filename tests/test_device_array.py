@@ -0,0 +1,92 @@
+# Tests that storing many devices together matches a register map per device
+from hypothesis import given, strategies
+from hypothesis.strategies import integers, lists, tuples, sampled_from
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder
+from saleae.register_decoder.register_map import RegisterNotObserved
+from saleae.register_decoder.device_array import DeviceArray
+
+from .strategies import register_maps, transaction_data
+
+
+@given(
+    register_maps(
+        register_gap=sampled_from([0, 1, 3, 600]),
+        register_width=integers(min_value=1, max_value=5),
+        register_count=integers(min_value=1, max_value=5),
+        value_type=sampled_from([bytes, int]),
+        address_byte_width=integers(min_value=1, max_value=2),
+    ),
+    strategies.data(),
+)
+def test_device_array_matches_register_maps(register_map_cls, data):
+    address_byte_width = register_map_cls.address_byte_width
+    device_count = data.draw(integers(min_value=1, max_value=4))
+    transactions = data.draw(
+        lists(
+            tuples(
+                integers(min_value=0, max_value=device_count - 1),
+                integers(min_value=0, max_value=640),
+                transaction_data(max_words=8, address_byte_width=address_byte_width),
+            ),
+            max_size=30,
+        )
+    )
+
+    devices = DeviceArray(register_map_cls, device_count)
+    expected = [register_map_cls() for _ in range(device_count)]
+    for device_id, address, observed_data in transactions:
+        assert devices.observe(device_id, address, observed_data) == expected[device_id].observe(address, observed_data)
+
+    for register in register_map_cls:
+        values = devices.values(register)
+        for device_id, reg_map in enumerate(expected):
+            try:
+                value = reg_map.deserialize(register)
+            except RegisterNotObserved:
+                assert values.mask[device_id]
+                with pytest.raises(RegisterNotObserved):
+                    devices.deserialize(device_id, register)
+            else:
+                assert not values.mask[device_id]
+                assert values[device_id] == value
+                assert devices.deserialize(device_id, register) == value
+    for device_id, reg_map in enumerate(expected):
+        assert devices.device(device_id).deserialize_all() == reg_map.deserialize_all()
+
+
+def test_memory_is_raw_register_bytes():
+    class Sensor(RegisterMap):
+        address_byte_width = 2
+
+        config = Register(0x00, address_width=4)
+        reading = Register(0x04, address_width=2, value_type=int, byte_order=ByteOrder.BIG, signed=True)
+
+    devices = DeviceArray(Sensor, 500)
+    assert devices._state.nbytes == 500 * 12
+    assert devices._mask.nbytes == 500
+
+    devices.observe(7, 0x04, b"\xff\xfe\x00\x01")
+    assert devices.values(Sensor.reading)[7] == -0x1FFFF
+    assert devices.observed(Sensor.reading).tolist() == [device_id == 7 for device_id in range(500)]
+    with pytest.raises(IndexError):
+        devices.observe(500, 0x00, b"\x00\x00")
+
+
+def test_empty_device_arrays():
+    class Sensor(RegisterMap):
+        config = Register(0x00)
+
+    class Empty(RegisterMap):
+        pass
+
+    devices = DeviceArray(Sensor, 0)
+    assert devices.device_count == 0
+    assert devices.values(Sensor.config).tolist() == []
+
+    devices = DeviceArray(Empty, 3)
+    assert devices.observe(1, 0x00, b"\x01") is None
+    assert devices.device(1).deserialize_all() == {}
@@ -0,0 +1,96 @@
+# Tests that bit fields are extracted from register values
+from enum import Enum
+
+from hypothesis import given, strategies
+from hypothesis.strategies import integers, booleans
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, Field, ByteOrder
+
+
+class Mode(Enum):
+    OFF = 0
+    ON = 1
+    AUTO = 2
+
+
+class MyRegMap(RegisterMap):
+    control = Register(
+        0x00,
+        address_width=2,
+        value_type=int,
+        byte_order=ByteOrder.LITTLE,
+        signed=False,
+        fields=[
+            Field("mode", 0, 2, enum=Mode),
+            Field("enable", 2),
+            Field("gain", 4, 4, signed=True),
+            Field("channel", 8, 8, enum={0: "left", 1: "right"}),
+        ],
+    )
+
+
+def test_deserialize_fields():
+    reg_map = MyRegMap()
+    reg_map.observe(0x00, (0b0000_0001_1110_0110).to_bytes(2, "little"))
+    assert reg_map.deserialize_fields(MyRegMap.control) == {
+        "mode": Mode.AUTO,
+        "enable": 1,
+        "gain": -2,
+        "channel": "right",
+    }
+
+    # Values not covered by an enum are left as integers
+    reg_map.observe(0x00, (0b0000_0111_0000_0011).to_bytes(2, "little"))
+    assert reg_map.deserialize_fields(MyRegMap.control) == {"mode": 3, "enable": 0, "gain": 0, "channel": 7}
+
+
+def test_field_validation():
+    with pytest.raises(ValueError, match="only allowed when value_type=int"):
+        Register(0x00, fields=[Field("enable", 0)])
+    with pytest.raises(ValueError, match="duplicate"):
+        Register(0x00, value_type=int, byte_order=ByteOrder.BIG, signed=False, fields=[Field("a", 0), Field("a", 1)])
+    with pytest.raises(ValueError, match="extends past the end"):
+
+        class MyBadRegMap(RegisterMap):
+            control = Register(0x00, value_type=int, byte_order=ByteOrder.BIG, signed=False, fields=[Field("a", 7, 2)])
+
+    class MyLazyBadRegMap(RegisterMap, lazy=True):
+        control = Register(0x00, value_type=int, byte_order=ByteOrder.BIG, signed=False, fields=[Field("a", 6, 4)])
+
+    # Lazy classes report the error on every use, rather than falling back to an empty address map
+    for _ in range(2):
+        with pytest.raises(ValueError, match="extends past the end"):
+            MyLazyBadRegMap()
+
+
+@given(integers(min_value=0, max_value=63), integers(min_value=1, max_value=64), booleans(), strategies.data())
+def test_extract_matches_bits(offset, width, signed, data):
+    field = Field("field", offset, width, signed=signed)
+    value = data.draw(integers(min_value=0, max_value=2**128 - 1))
+
+    bits = bin(value)[2:].zfill(128)[::-1][offset : offset + width][::-1]
+    expected = int(bits, 2)
+    if signed and bits[0] == "1":
+        expected -= 2**width
+    assert field.extract(value) == expected
+
+
+@pytest.mark.parametrize("dtype", ["i1", "u1", "i2", "u2", "i4", "u4", "i8", "u8"])
+@given(booleans(), strategies.data())
+def test_extract_array_matches_extract(dtype, signed, data):
+    np = pytest.importorskip("numpy")
+    dtype = np.dtype(dtype)
+    bits = dtype.itemsize * 8
+    # Fields as wide as the values, or one bit narrower, are the most likely to overflow
+    width = data.draw(
+        strategies.one_of(strategies.sampled_from([bits - 1, bits]), integers(min_value=1, max_value=bits))
+    )
+    offset = data.draw(integers(min_value=0, max_value=bits - width))
+    field = Field("field", offset, width, signed=signed)
+    info = np.iinfo(dtype)
+    values = data.draw(strategies.lists(integers(min_value=int(info.min), max_value=int(info.max)), min_size=1))
+
+    extracted = field.extract_array(np.array(values, dtype=dtype))
+    assert extracted.dtype.itemsize == dtype.itemsize
+    assert extracted.tolist() == [field.extract(value) for value in values]
@@ -0,0 +1,77 @@
+# Tests that a `TransactionHistory` reproduces the state a `RegisterMap` had at past times
+from hypothesis import given
+from hypothesis.strategies import integers
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder, TransactionHistory
+from saleae.register_decoder.register_map import RegisterNotObserved
+
+from .strategies import register_maps, transactions
+
+
+class MyRegMap(RegisterMap):
+    status = Register(0x00)
+    count = Register(0x01, address_width=2, value_type=int, byte_order=ByteOrder.BIG, signed=False)
+
+
+def test_value_at():
+    history = TransactionHistory()
+    reg_map = MyRegMap(history=history)
+    reg_map.observe(0x01, b"\x00\x01", timestamp=1.0)
+    reg_map.observe(0x00, b"\x05\x00", timestamp=2.0)
+    reg_map.observe(0x02, b"\x03", timestamp=3.5)
+
+    assert len(history) == 3
+    with pytest.raises(RegisterNotObserved):
+        history.value_at(MyRegMap.count, 0.5)
+    assert history.value_at(MyRegMap.count, 1.0) == 0x0001
+    assert history.value_at(MyRegMap.count, 3.0) == 0x0001
+    assert history.value_at(MyRegMap.count, 4.0) == 0x0003
+    assert history.value_at(MyRegMap.status, 4.0) == b"\x05"
+    assert history.values_between(MyRegMap.count) == [(1.0, 0x0001), (2.0, 0x0001), (3.5, 0x0003)]
+    assert history.values_between(MyRegMap.count, 1.5, 3.5) == [(2.0, 0x0001)]
+    assert list(history.transactions(2.0)) == [(2.0, 0x00, b"\x05\x00"), (3.5, 0x02, b"\x03")]
+
+    with pytest.raises(ValueError, match="must not decrease"):
+        reg_map.observe(0x00, b"\x01", timestamp=3.0)
+
+
+@given(
+    register_maps(),
+    transactions(max_size=30, max_words=16),
+    integers(min_value=100, max_value=2000),
+)
+def test_value_at_matches_replay(register_map_cls, transactions, max_bytes):
+    history = TransactionHistory(max_bytes=max_bytes)
+    reg_map = register_map_cls(history=history)
+    replayed = register_map_cls()
+    states = []
+    for timestamp, (address, data) in enumerate(transactions):
+        reg_map.observe(address, data, timestamp=float(timestamp))
+        replayed.observe(address, data)
+        states.append({register: replayed._raw_value(register) for register in register_map_cls})
+
+    for timestamp, state in enumerate(states):
+        if history._evicted_until is not None and timestamp < history._evicted_until:
+            continue
+        for register, raw_value in state.items():
+            if raw_value is None:
+                with pytest.raises(RegisterNotObserved):
+                    history.value_at(register, float(timestamp))
+            else:
+                assert history.value_at(register, float(timestamp)) == raw_value
+
+
+def test_observe_many_records_history():
+    history = TransactionHistory(max_bytes=3 * 30)
+    reg_map = MyRegMap(history=history)
+    reg_map.observe_many([(0x01, bytes([0, i])) for i in range(10)], timestamps=[float(i) for i in range(10)])
+
+    # Only the newest transactions fit, but older ones are folded into the state they build on
+    assert len(history) < 10
+    assert [value for _, value in history.values_between(MyRegMap.count)] == list(range(10 - len(history), 10))
+    with pytest.raises(ValueError, match="evicted"):
+        history.value_at(MyRegMap.count, 0.0)
+    with pytest.raises(ValueError, match="must not decrease"):
+        reg_map.observe_many([(0x00, b"\x00"), (0x00, b"\x01")], timestamps=[10.0, 9.0])
+    assert history.latest_timestamp == 9.0
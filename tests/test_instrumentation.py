@@ -0,0 +1,66 @@
+# Tests instrumentation of register map usage
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, Instrumentation
+
+
+class MyRegMap(RegisterMap):
+    control = Register(0x00)
+    status = Register(0x01, address_width=2, value_type=str, value_parser=lambda raw: raw.hex())
+    data = Register(0x04, address_width=2)
+
+
+def test_counts_observations():
+    instrumentation = Instrumentation()
+    reg_map = MyRegMap(instrumentation=instrumentation)
+    reg_map.observe(0x00, b"\x01\x02\x03")
+    reg_map.observe(0x05, b"\x01\x02")
+    reg_map.observe(0x10, b"\x01")
+    reg_map.observe_many([(0x01, b"\x01\x02"), (0x20, b"\x01"), (0x04, b"\x01")])
+
+    stats = instrumentation.stats()
+    assert stats["transactions"] == 6
+    assert stats["dropped"] == 2
+    assert stats["clamped"] == 1
+    assert stats["observed"] == {"control": 1, "status": 2, "data": 2}
+
+
+def test_counts_deserialization_and_parser_time():
+    instrumentation = Instrumentation()
+    reg_map = MyRegMap(instrumentation=instrumentation)
+    reg_map.observe(0x00, b"\x01\x02\x03")
+    assert reg_map.deserialize(MyRegMap.status) == "0203"
+    assert reg_map.deserialize_all() == {MyRegMap.control: b"\x01", MyRegMap.status: "0203"}
+
+    stats = instrumentation.stats()
+    assert stats["deserialized"] == {"control": 1, "status": 2}
+    assert stats["parser_calls"] == 2
+    assert stats["parser_seconds"] > 0
+
+    instrumentation.reset()
+    assert instrumentation.stats()["deserialized"] == {}
+
+
+def test_callback_reports_periodically():
+    reports = []
+    reg_map = MyRegMap(instrumentation=Instrumentation(callback=reports.append, report_every=2))
+    for _ in range(5):
+        reg_map.observe(0x00, b"\x01")
+    assert [report["transactions"] for report in reports] == [2, 4]
+
+
+def test_uninstrumented_maps_use_class_methods():
+    reg_map = MyRegMap()
+    assert "observe" not in reg_map.__dict__
+
+    instrumented = MyRegMap(instrumentation=Instrumentation())
+    clone = instrumented.clone()
+    assert "observe" not in clone.__dict__
+    assert "_compiled_registers" not in clone.__dict__
+
+
+def test_single_register_map():
+    instrumentation = Instrumentation()
+    MyRegMap(instrumentation=instrumentation)
+    with pytest.raises(ValueError, match="single register map"):
+        MyRegMap(instrumentation=instrumentation)
@@ -0,0 +1,218 @@
+# Tests that register maps can be loaded from JSON schemas and SVD files, and cached
+import json
+import marshal
+
+import pytest
+
+from saleae.register_decoder import ByteOrder, register_map_from_schema, load_json, load_svd
+from saleae.register_decoder import loaders
+
+SVD = b"""<?xml version="1.0" encoding="utf-8"?>
+<device>
+  <name>MyDevice</name>
+  <addressUnitBits>8</addressUnitBits>
+  <size>32</size>
+  <peripherals>
+    <peripheral>
+      <name>TIMER0</name>
+      <baseAddress>0x40000000</baseAddress>
+      <registers>
+        <register>
+          <name>CTRL</name>
+          <description>Control
+            register</description>
+          <addressOffset>0x0</addressOffset>
+          <fields>
+            <field>
+              <name>EN</name>
+              <bitOffset>0</bitOffset>
+              <bitWidth>1</bitWidth>
+              <enumeratedValues>
+                <enumeratedValue><name>Disabled</name><value>0</value></enumeratedValue>
+                <enumeratedValue><name>Enabled</name><value>1</value></enumeratedValue>
+              </enumeratedValues>
+            </field>
+            <field>
+              <name>PRESCALER</name>
+              <bitRange>[11:8]</bitRange>
+            </field>
+          </fields>
+        </register>
+        <register>
+          <name>CTRL_ALT</name>
+          <alternateRegister>CTRL</alternateRegister>
+          <addressOffset>0x0</addressOffset>
+        </register>
+        <register>
+          <name>CC[%s]</name>
+          <dim>2</dim>
+          <dimIncrement>4</dimIncrement>
+          <addressOffset>0x10</addressOffset>
+          <size>16</size>
+        </register>
+        <register>
+          <name>CH%s</name>
+          <dim>2</dim>
+          <dimIndex>A-B</dimIndex>
+          <dimIncrement>1</dimIncrement>
+          <addressOffset>0x18</addressOffset>
+          <size>8</size>
+        </register>
+        <cluster>
+          <name>EVENT</name>
+          <addressOffset>0x20</addressOffset>
+          <register>
+            <name>STATUS</name>
+            <addressOffset>0x4</addressOffset>
+            <size>8</size>
+          </register>
+        </cluster>
+      </registers>
+    </peripheral>
+    <peripheral derivedFrom="TIMER0">
+      <name>TIMER1</name>
+      <baseAddress>0x40001000</baseAddress>
+    </peripheral>
+    <peripheral derivedFrom="TIMER0">
+      <name>COUNTER0</name>
+      <alternatePeripheral>TIMER0</alternatePeripheral>
+      <baseAddress>0x40000000</baseAddress>
+    </peripheral>
+  </peripherals>
+</device>
+"""
+
+SCHEMA = {
+    "name": "MyRegMap",
+    "address_byte_width": 2,
+    "registers": [
+        {"name": "count", "address": 1, "value_type": "int", "byte_order": "big", "signed": False},
+        {"name": "status", "address": 0, "description": "Status of device"},
+        {"name": "model", "address": 2, "address_width": 2, "value_type": "str", "text_encoding": "ascii"},
+        {
+            "name": "control",
+            "address": 4,
+            "value_type": "int",
+            "byte_order": "little",
+            "signed": False,
+            "fields": [{"name": "mode", "offset": 0, "width": 2, "enum": {"0": "off", "1": "on"}}],
+        },
+    ],
+}
+
+
+def test_register_map_from_schema():
+    MyRegMap = register_map_from_schema(SCHEMA)
+    assert MyRegMap.__name__ == "MyRegMap"
+    assert [register.name for register in MyRegMap] == ["status", "count", "model", "control"]
+
+    reg_map = MyRegMap()
+    reg_map.observe(0x00, b"\x00\x01\x12\x34abcd\x01\x00")
+    assert reg_map.deserialize_fields(MyRegMap.control) == {"mode": "on"}
+    assert reg_map.deserialize(MyRegMap.status) == b"\x00\x01"
+    assert reg_map.deserialize(MyRegMap.count) == 0x1234
+    assert reg_map.deserialize(MyRegMap.model) == "abcd"
+
+
+def test_register_map_from_schema_overlap():
+    with pytest.raises(ValueError, match=r"\boverlap\b"):
+        register_map_from_schema(
+            {"registers": [{"name": "a", "address": 0, "address_width": 2}, {"name": "b", "address": 1}]}
+        )
+
+
+@pytest.mark.parametrize("name", ["observe", "address_byte_width", "registers_intersecting", "_internal_state"])
+def test_register_map_from_schema_reserved_name(name):
+    with pytest.raises(ValueError, match="clashes with an attribute of RegisterMap"):
+        register_map_from_schema({"registers": [{"name": name, "address": 0}]})
+
+
+def test_load_svd(tmp_path):
+    path = tmp_path / "device.svd"
+    path.write_bytes(SVD)
+
+    MyDevice = load_svd(path)
+    assert [(register.name, register.address, register.address_width) for register in MyDevice] == [
+        ("TIMER0_CTRL", 0x4000_0000, 4),
+        ("TIMER0_CC0", 0x4000_0010, 2),
+        ("TIMER0_CC1", 0x4000_0014, 2),
+        ("TIMER0_CHA", 0x4000_0018, 1),
+        ("TIMER0_CHB", 0x4000_0019, 1),
+        ("TIMER0_EVENT_STATUS", 0x4000_0024, 1),
+        ("TIMER1_CTRL", 0x4000_1000, 4),
+        ("TIMER1_CC0", 0x4000_1010, 2),
+        ("TIMER1_CC1", 0x4000_1014, 2),
+        ("TIMER1_CHA", 0x4000_1018, 1),
+        ("TIMER1_CHB", 0x4000_1019, 1),
+        ("TIMER1_EVENT_STATUS", 0x4000_1024, 1),
+    ]
+    assert MyDevice.TIMER0_CTRL.description == "Control register"
+    assert MyDevice.TIMER0_CTRL._byte_order == ByteOrder.LITTLE
+
+    reg_map = MyDevice()
+    reg_map.observe(0x4000_1010, b"\x34\x12")
+    assert reg_map.deserialize(MyDevice.TIMER1_CC0) == 0x1234
+    reg_map.observe(0x4000_0000, b"\x01\x05\x00\x00")
+    assert reg_map.deserialize_fields(MyDevice.TIMER0_CTRL) == {"EN": "Enabled", "PRESCALER": 5}
+
+    Timer1 = load_svd(path, peripheral="TIMER1")
+    assert [register.name for register in Timer1] == ["CTRL", "CC0", "CC1", "CHA", "CHB", "EVENT_STATUS"]
+
+    # Alternate peripherals are only skipped when loading the whole device
+    Counter0 = load_svd(path, peripheral="COUNTER0")
+    assert Counter0.CTRL.address == 0x4000_0000
+
+
+@pytest.mark.parametrize("kind", ["json", "svd"])
+def test_load_cached(tmp_path, monkeypatch, kind):
+    if kind == "json":
+        path = tmp_path / "schema.json"
+        path.write_text(json.dumps(SCHEMA))
+        load = load_json
+    else:
+        path = tmp_path / "device.svd"
+        path.write_bytes(SVD)
+        load = load_svd
+    cache_dir = tmp_path / "cache"
+
+    uncached = load(path, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # Loading again must not parse the source
+    monkeypatch.setattr(loaders, "_parse_schema", None)
+    monkeypatch.setattr(loaders, "_parse_svd", None)
+    cached = load(path, cache_dir=cache_dir)
+    assert repr(cached) == repr(uncached)
+    assert cached.active_lookup_strategy == uncached.active_lookup_strategy
+    for register in cached:
+        assert cached.register_containing(register.address) is register
+        assert cached.register_containing(register.address + register.address_width - 1) is register
+    assert [cached.state_slice(register) for register in cached] == [
+        uncached.state_slice(register) for register in uncached
+    ]
+    assert cached._segment_starts == uncached._segment_starts
+    assert cached._compact_size == uncached._compact_size
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        b"",
+        b"garbage",
+        marshal.dumps(1),
+        marshal.dumps(("MyRegMap", 2, [("status",)], ([0], [1], [0], [0], b""))),
+        marshal.dumps(("MyRegMap", 2, [], (1, 2))),
+    ],
+)
+def test_load_ignores_bad_cache(tmp_path, contents):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(SCHEMA))
+    cache_dir = tmp_path / "cache"
+    load_json(path, cache_dir=cache_dir)
+    (cache_file,) = cache_dir.iterdir()
+    cache_file.write_bytes(contents)
+
+    # Bad cache entries are treated as misses, and replaced
+    MyRegMap = load_json(path, cache_dir=cache_dir)
+    assert [register.name for register in MyRegMap] == ["status", "count", "model", "control"]
+    assert cache_file.read_bytes() != contents
@@ -0,0 +1,124 @@
+# Tests that batched observation matches observing transactions one at a time
+from hypothesis import given
+from hypothesis.strategies import integers
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ChangeTracking
+from saleae.register_decoder.register_map import RegisterNotObserved
+
+from .strategies import register_maps, transactions
+
+
+def observe_serially(register_map: RegisterMap, transactions):
+    observed = []
+    for address, data in transactions:
+        observed.append(register_map.observe(address, data) or [])
+    return observed
+
+
+@given(register_maps(), transactions())
+def test_observe_many_matches_observe(register_map_cls, transactions):
+    serial = register_map_cls()
+    observed = observe_serially(serial, transactions)
+
+    batched = register_map_cls()
+    assert batched.observe_many(transactions) == sorted(
+        {id(reg): reg for regs in observed for reg in regs}.values(), key=lambda reg: reg.address
+    )
+    assert batched._internal_state == serial._internal_state
+    assert batched._internal_state_mask == serial._internal_state_mask
+
+
+@given(register_maps(), transactions())
+def test_observe_many_flat_buffer_per_transaction(register_map_cls, transactions):
+    serial = register_map_cls()
+    observed = observe_serially(serial, transactions)
+
+    offsets = [0]
+    for _, data in transactions:
+        offsets.append(offsets[-1] + len(data))
+    batched = register_map_cls()
+    register_indices, transaction_offsets = batched.observe_many(
+        [address for address, _ in transactions],
+        b"".join(data for _, data in transactions),
+        offsets,
+        per_transaction=True,
+    )
+    registers = list(register_map_cls)
+    for i, expected in enumerate(observed):
+        assert [
+            registers[index] for index in register_indices[transaction_offsets[i] : transaction_offsets[i + 1]]
+        ] == expected
+    assert batched._internal_state == serial._internal_state
+    assert batched._internal_state_mask == serial._internal_state_mask
+
+
+@given(register_maps(), transactions(max_size=None, min_words=4, max_words=4))
+def test_observe_many_structured_array(register_map_cls, transactions):
+    np = pytest.importorskip("numpy")
+    serial = register_map_cls()
+    observe_serially(serial, transactions)
+
+    batched = register_map_cls()
+    batched.observe_many(np.array(transactions, dtype=[("address", "<u4"), ("data", "S4")]))
+    assert batched._internal_state == serial._internal_state
+    assert batched._internal_state_mask == serial._internal_state_mask
+
+
+@given(register_maps(), transactions())
+def test_observe_many_batches_match_hooked_path(register_map_cls, transactions):
+    # Tracking changes makes every transaction go through `_apply`, as `observe` does
+    hooked = register_map_cls(track_changes=ChangeTracking.WRITES)
+    batched = register_map_cls()
+    assert batched.observe_many(transactions, per_transaction=True) == hooked.observe_many(
+        transactions, per_transaction=True
+    )
+    assert batched._internal_state == hooked._internal_state
+    assert batched._internal_state_mask == hooked._internal_state_mask
+
+
+def test_observe_many_validates_before_applying():
+    class MyRegMap(RegisterMap):
+        address_byte_width = 2
+
+        status = Register(0x00)
+
+    reg_map = MyRegMap()
+    with pytest.raises(ValueError, match="divisible"):
+        reg_map.observe_many([(0x00, b"\x01\x02"), (0x00, b"\x03")])
+    assert reg_map._internal_state == bytearray(2)
+
+
+@given(register_maps(register_gap=integers(min_value=0, max_value=1000)), transactions())
+def test_deserialize_matches_observed_bytes(register_map_cls, transactions):
+    reg_map = register_map_cls()
+    expected = {}
+    for address, data in transactions:
+        reg_map.observe(address, data)
+        for i, byte in enumerate(data):
+            expected[address + i] = byte
+
+    for register in register_map_cls:
+        addresses = range(register.address, register.address + register.address_width)
+        if all(address in expected for address in addresses):
+            assert reg_map.deserialize(register) == bytes(expected[address] for address in addresses)
+        else:
+            with pytest.raises(RegisterNotObserved):
+                reg_map.deserialize(register)
+
+
+def test_sparse_map_allocates_only_declared_pages():
+    class MyRegMap(RegisterMap):
+        address_byte_width = 4
+
+        control = Register(0x0000_0010)
+        status = Register(0x4000_0000, address_width=2)
+        data = Register(0x4000_0400)
+
+    reg_map = MyRegMap()
+    assert len(reg_map._internal_state) < 4096
+
+    reg_map.observe(0x3FFF_FFFF, b"\x00" * 4 + b"\x01\x02\x03\x04\x05\x06\x07\x08")
+    assert reg_map.deserialize(MyRegMap.status) == b"\x01\x02\x03\x04\x05\x06\x07\x08"
+    with pytest.raises(RegisterNotObserved):
+        reg_map.deserialize(MyRegMap.data)
@@ -45,3 +45,24 @@ def test_parse_signed_integer(address_width: int, addr_byte_width: int, address:
 
     reg_map.observe(address, value.to_bytes(byte_count, byteorder=byte_order.value, signed=True))
     assert reg_map.deserialize(MyRegMap.my_reg) == value
+
+
+def test_deserialize_all():
+    class MyRegMap(RegisterMap):
+        address_byte_width = 2
+
+        status = Register(0x00, value_type=int, byte_order=ByteOrder.BIG, signed=False)
+        name = Register(0x01, address_width=2, value_type=str, text_encoding="ascii")
+        raw = Register(0x03, address_width=3)
+        scaled = Register(0x06, value_parser=lambda data: int.from_bytes(data, "little") / 10)
+        unobserved = Register(0x07)
+
+    reg_map = MyRegMap()
+    reg_map.observe(0x00, b"\x12\x34abcd\x00\x01\x02\x03\x04\x05\x10\x00")
+    assert reg_map.deserialize_all() == {
+        MyRegMap.status: 0x1234,
+        MyRegMap.name: "abcd",
+        MyRegMap.raw: b"\x00\x01\x02\x03\x04\x05",
+        MyRegMap.scaled: 1.6,
+    }
+    assert list(reg_map.deserialize_all()) == [MyRegMap.status, MyRegMap.name, MyRegMap.raw, MyRegMap.scaled]
@@ -0,0 +1,68 @@
+# Tests that parallel replay matches observing transactions one at a time
+from concurrent.futures import ThreadPoolExecutor
+
+from hypothesis import given
+from hypothesis.strategies import integers
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder, replay_capture, decoded_changes
+
+from .strategies import register_maps, transactions
+
+
+class MyRegMap(RegisterMap):
+    address_byte_width = 2
+
+    control = Register(0x00, value_type=int, byte_order=ByteOrder.LITTLE, signed=False)
+    status = Register(0x01, address_width=2, value_type=int, byte_order=ByteOrder.BIG, signed=True)
+    data = Register(0x40, address_width=4)
+
+
+def expected_changes(reg_map, transactions, first_index=0):
+    changes = []
+    for index, (address, data) in enumerate(transactions):
+        before = {register: reg_map._raw_value(register) for register in reg_map.__class__}
+        reg_map.observe(address, data)
+        for register in reg_map.__class__:
+            raw_value = reg_map._raw_value(register)
+            if raw_value is not None and raw_value != before[register]:
+                changes.append((first_index + index, register.name, reg_map.deserialize(register)))
+    return changes
+
+
+@given(
+    register_maps(),
+    transactions(max_size=30),
+    integers(min_value=1, max_value=8),
+)
+def test_replay_matches_serial(register_map_cls, transactions, chunk_size):
+    serial = register_map_cls()
+    changes = expected_changes(serial, transactions)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = replay_capture(
+            register_map_cls, transactions, emit=decoded_changes, chunk_size=chunk_size, executor=executor
+        )
+    assert result.register_map._internal_state == serial._internal_state
+    assert result.register_map._internal_state_mask == serial._internal_state_mask
+    assert [change for chunk in result.results for change in chunk] == changes
+
+
+def test_replay_in_processes():
+    transactions = [(i % 0x48, bytes([i % 256, i // 256]) * (1 + i % 3)) for i in range(500)]
+    initial = MyRegMap()
+    initial.observe(0x40, bytes(range(8)))
+
+    serial = MyRegMap()
+    serial.observe(0x40, bytes(range(8)))
+    changes = expected_changes(serial, transactions)
+
+    result = replay_capture(MyRegMap, transactions, initial=initial, emit=decoded_changes, chunk_size=64, max_workers=2)
+    assert len(result.results) == 8
+    assert result.register_map.deserialize_all() == serial.deserialize_all()
+    assert [change for chunk in result.results for change in chunk] == changes
+
+
+def test_replay_validates_chunks():
+    with pytest.raises(ValueError, match="divisible"):
+        replay_capture(MyRegMap, [(0x00, b"\x01")])
@@ -4,7 +4,7 @@ from hypothesis import given, assume, strategies
 from hypothesis.strategies import integers
 import pytest
 
-from saleae.register_decoder import RegisterMap, Register
+from saleae.register_decoder import RegisterMap, Register, LookupStrategy
 
 from .strategies import register_maps
 
@@ -87,3 +87,71 @@ def test_registers_intersecting(register_map: RegisterMap, data):
         stop = data.draw(integers(min_value=start))
         assert register not in register_map.registers_intersecting(slice(start, stop))
 
+
+def test_lookup_strategy_from_density():
+    class DenseRegMap(RegisterMap):
+        status = Register(0x00)
+        data = Register(0x10, address_width=0x10)
+
+    class SparseRegMap(RegisterMap):
+        status = Register(0x00)
+        data = Register(0x4000_0000, address_width=4)
+
+    class BisectRegMap(DenseRegMap):
+        lookup_strategy = LookupStrategy.BISECT
+
+    assert DenseRegMap.active_lookup_strategy == LookupStrategy.TABLE
+    assert SparseRegMap.active_lookup_strategy == LookupStrategy.BISECT
+    assert BisectRegMap.active_lookup_strategy == LookupStrategy.BISECT
+    for reg_map in [DenseRegMap, SparseRegMap, BisectRegMap]:
+        assert reg_map.register_containing(0x00) == reg_map.status
+        assert reg_map.register_containing(0x01) is None
+        assert reg_map.registers_intersecting(slice(0x00, 0x4000_0004)) == [reg_map.status, reg_map.data]
+
+
+def test_overlap_reported_in_definition_order():
+    with pytest.raises(ValueError, match=r"^the registers data and status overlap$"):
+
+        class MyRegMap(RegisterMap):
+            status = Register(0x02, address_width=2)
+            control = Register(0x00)
+            data = Register(0x01, address_width=2)
+
+    # The first register overlapping an earlier one is reported, rather than the lowest addressed overlap
+    with pytest.raises(ValueError, match=r"^the registers b and a overlap$"):
+
+        class OtherRegMap(RegisterMap):
+            a = Register(0x04)
+            b = Register(0x00, address_width=10)
+            c = Register(0x02)
+
+
+def test_lazy_register_map():
+    class MyRegMap(RegisterMap, lazy=True):
+        status = Register(0x01)
+        data = Register(0x00)
+
+    class MyDerivedRegMap(MyRegMap):
+        control = Register(0x02)
+
+    assert list(MyRegMap) == [MyRegMap.data, MyRegMap.status]
+    assert list(MyDerivedRegMap) == [MyRegMap.data, MyRegMap.status, MyDerivedRegMap.control]
+    assert MyDerivedRegMap.register_containing(0x02) == MyDerivedRegMap.control
+
+    class MyOverlappingRegMap(RegisterMap, lazy=True):
+        status = Register(0x00, address_width=2)
+        data = Register(0x01)
+
+    # Overlaps are reported on first use rather than when the class is created
+    for _ in range(2):
+        with pytest.raises(ValueError, match=r"\boverlap\b"):
+            MyOverlappingRegMap()
+
+
+def test_large_register_map():
+    register_count = 20_000
+    members = {f"reg_{i}": Register(i * 2, address_width=2) for i in reversed(range(register_count))}
+    register_map = RegisterMap.__class__("MyRegMap", (RegisterMap,), members)
+
+    assert [register.address for register in register_map] == list(range(0, register_count * 2, 2))
+    assert register_map.register_containing(2 * register_count - 1) == members[f"reg_{register_count - 1}"]
@@ -0,0 +1,96 @@
+# Tests snapshots, restoring and cloning register map state
+from hypothesis import given
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ChangeTracking, TransactionHistory
+
+from .strategies import register_maps, transactions
+
+
+class MyRegMap(RegisterMap):
+    control = Register(0x00)
+    status = Register(0x01, address_width=2)
+    data = Register(0x1000, address_width=4)
+
+
+@given(register_maps(), transactions(max_size=10), transactions(max_size=10))
+def test_restore_returns_to_snapshot(register_map_cls, before, after):
+    reg_map = register_map_cls()
+    reg_map.observe_many(before)
+    snapshot = reg_map.snapshot()
+    expected = reg_map.deserialize_all()
+
+    reg_map.observe_many(after)
+    reg_map.restore(snapshot)
+    assert reg_map.deserialize_all() == expected
+
+    other = register_map_cls()
+    other.restore(snapshot)
+    assert other.deserialize_all() == expected
+
+
+@given(register_maps(), transactions(max_size=10), transactions(max_size=10), transactions(max_size=10))
+def test_clone_is_independent(register_map_cls, before, original_after, clone_after):
+    reg_map = register_map_cls()
+    reg_map.observe_many(before)
+    clone = reg_map.clone()
+
+    expected_original = register_map_cls()
+    expected_original.observe_many(before + original_after)
+    expected_clone = register_map_cls()
+    expected_clone.observe_many(before + clone_after)
+
+    reg_map.observe_many(original_after)
+    clone.observe_many(clone_after)
+    assert reg_map.deserialize_all() == expected_original.deserialize_all()
+    assert clone.deserialize_all() == expected_clone.deserialize_all()
+
+
+def test_clone_shares_state_until_written():
+    reg_map = MyRegMap()
+    reg_map.observe(0x00, b"\x01\x02\x03")
+    clone = reg_map.clone()
+    assert clone._internal_state is reg_map._internal_state
+
+    clone.observe(0x00, b"\x04")
+    assert clone._internal_state is not reg_map._internal_state
+    assert reg_map.deserialize(MyRegMap.control) == b"\x01"
+    assert clone.deserialize(MyRegMap.control) == b"\x04"
+
+    # The original is the last map using the shared state, so it keeps it
+    state = reg_map._internal_state
+    reg_map.observe(0x00, b"\x05")
+    assert reg_map._internal_state is state
+
+
+def test_restore_tracks_changes():
+    reg_map = MyRegMap(track_changes=ChangeTracking.WRITES)
+    reg_map.observe(0x00, b"\x01\x02\x03")
+    snapshot = reg_map.snapshot()
+    reg_map.observe(0x01, b"\x04\x05")
+
+    generation = reg_map.generation
+    reg_map.restore(snapshot)
+    assert reg_map.changed_since(generation) == [MyRegMap.status]
+
+
+def test_restore_validates_snapshot():
+    class OtherRegMap(RegisterMap):
+        control = Register(0x00)
+
+    with pytest.raises(ValueError, match="different register map"):
+        MyRegMap().restore(OtherRegMap().snapshot())
+    with pytest.raises(RuntimeError, match="history"):
+        MyRegMap(history=TransactionHistory()).restore(MyRegMap().snapshot())
+
+
+def test_state_buffers():
+    reg_map = MyRegMap()
+    reg_map.observe(0x1000, b"\x01\x02\x03\x04")
+    state, mask = reg_map.state_buffers()
+    assert state.readonly and mask.readonly
+    assert state[MyRegMap.state_slice(MyRegMap.data)] == b"\x01\x02\x03\x04"
+
+    # The views follow later observations
+    reg_map.observe(0x1000, b"\x05")
+    assert state[MyRegMap.state_slice(MyRegMap.data)] == b"\x05\x02\x03\x04"
@@ -0,0 +1,97 @@
+# Tests asyncio subscriptions to register changes
+import asyncio
+import threading
+
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register, ByteOrder, ChangeFeed, ChangeEvent, Overflow
+
+
+class MyRegMap(RegisterMap):
+    control = Register(0x00, value_type=int, byte_order=ByteOrder.LITTLE, signed=False)
+    status = Register(0x01, address_width=2)
+    data = Register(0x10, address_width=2)
+
+
+def test_delivers_changes_in_batches():
+    async def main():
+        feed = ChangeFeed()
+        reg_map = MyRegMap(change_feed=feed)
+        async with feed.subscribe([MyRegMap.control], addresses=[slice(0x02, 0x03)]) as subscription:
+            assert subscription.registers == {MyRegMap.control, MyRegMap.status}
+            reg_map.observe(0x00, b"\x01\x02", 1.0)
+            reg_map.observe(0x02, b"\x03", 2.0)
+            # Unchanged values and registers without subscribers produce no events
+            reg_map.observe(0x00, b"\x01", 3.0)
+            reg_map.observe(0x10, b"\x01\x02", 4.0)
+            assert await subscription.__anext__() == [
+                ChangeEvent(MyRegMap.control, 1, 1.0),
+                ChangeEvent(MyRegMap.status, b"\x02\x03", 2.0),
+            ]
+
+    asyncio.run(main())
+
+
+def test_coalesce_keeps_latest_value():
+    async def main():
+        feed = ChangeFeed()
+        reg_map = MyRegMap(change_feed=feed)
+        subscription = feed.subscribe([MyRegMap.control, MyRegMap.data], maxsize=1)
+        for value in range(5):
+            reg_map.observe(0x00, bytes([value]))
+        assert await subscription.__anext__() == [ChangeEvent(MyRegMap.control, 4, None)]
+        assert subscription.dropped == 0
+
+        reg_map.observe(0x00, b"\x05")
+        reg_map.observe(0x10, b"\x01\x02")
+        assert await subscription.__anext__() == [ChangeEvent(MyRegMap.data, b"\x01\x02", None)]
+        assert subscription.dropped == 1
+
+    asyncio.run(main())
+
+
+def test_drop_oldest_with_max_batch():
+    async def main():
+        feed = ChangeFeed()
+        reg_map = MyRegMap(change_feed=feed)
+        subscription = feed.subscribe([MyRegMap.control], maxsize=3, overflow=Overflow.DROP_OLDEST, max_batch=2)
+        for value in range(5):
+            reg_map.observe(0x00, bytes([value]))
+        assert [event.value for event in await subscription.__anext__()] == [2, 3]
+        assert [event.value for event in await subscription.__anext__()] == [4]
+        assert subscription.dropped == 2
+
+    asyncio.run(main())
+
+
+def test_observing_from_another_thread():
+    async def main():
+        feed = ChangeFeed()
+        reg_map = MyRegMap(change_feed=feed)
+        subscription = feed.subscribe([MyRegMap.control], overflow=Overflow.DROP_OLDEST)
+
+        def ingest():
+            for value in range(100):
+                reg_map.observe(0x00, bytes([value]))
+            subscription.close()
+
+        thread = threading.Thread(target=ingest)
+        thread.start()
+        values = [event.value async for events in subscription for event in events]
+        thread.join()
+        assert values == list(range(100))
+
+    asyncio.run(main())
+
+
+def test_closing_unsubscribes():
+    feed = ChangeFeed()
+    reg_map = MyRegMap(change_feed=feed)
+    subscription = feed.subscribe([MyRegMap.control])
+    subscription.close()
+    reg_map.observe(0x00, b"\x01")
+    assert not subscription._pending
+    assert not any(feed._watched)
+
+    with pytest.raises(RuntimeError, match="given to a RegisterMap"):
+        ChangeFeed().subscribe([MyRegMap.control])
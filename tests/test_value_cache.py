@@ -0,0 +1,57 @@
+# Tests that a `RegisterMap` caching values only re-parses registers that were observed again
+import pytest
+
+from saleae.register_decoder import RegisterMap, Register
+
+
+def make_reg_map_cls(parsed):
+    def parse(data: bytes) -> int:
+        parsed.append(data)
+        return int.from_bytes(data, "little")
+
+    class MyRegMap(RegisterMap):
+        status = Register(0x00, value_parser=parse)
+        data = Register(0x01, address_width=2, value_parser=parse)
+        control = Register(0x03, value_parser=parse)
+
+    return MyRegMap
+
+
+def test_value_cache_invalidated_by_observe():
+    parsed = []
+    MyRegMap = make_reg_map_cls(parsed)
+    reg_map = MyRegMap(cache_values=True)
+    reg_map.observe(0x00, b"\x01\x02\x03\x04")
+
+    assert reg_map.deserialize(MyRegMap.data) == 0x0302
+    assert reg_map.deserialize(MyRegMap.data) == 0x0302
+    assert len(parsed) == 1
+
+    reg_map.observe(0x02, b"\x05")
+    assert reg_map.deserialize_all() == {MyRegMap.status: 1, MyRegMap.data: 0x0502, MyRegMap.control: 4}
+    assert reg_map.deserialize(MyRegMap.data) == 0x0502
+    assert len(parsed) == 4
+    assert reg_map.value_cache_info() == (2, 4, None, 3)
+
+
+def test_value_cache_lru_eviction():
+    parsed = []
+    MyRegMap = make_reg_map_cls(parsed)
+    reg_map = MyRegMap(cache_values=True, cache_size=2)
+    reg_map.observe(0x00, b"\x01\x02\x03\x04")
+
+    reg_map.deserialize(MyRegMap.status)
+    reg_map.deserialize(MyRegMap.data)
+    reg_map.deserialize(MyRegMap.status)
+    # Evicts `data`, the least recently used
+    reg_map.deserialize(MyRegMap.control)
+    reg_map.deserialize(MyRegMap.status)
+    reg_map.deserialize(MyRegMap.data)
+    assert reg_map.value_cache_info() == (2, 4, 2, 2)
+
+
+def test_value_cache_disabled():
+    with pytest.raises(RuntimeError):
+        make_reg_map_cls([])().value_cache_info()
+    with pytest.raises(ValueError):
+        make_reg_map_cls([])(cache_size=10)